@@ -13,6 +13,9 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'restapi.metrics.MetricsMiddleware',
+    'restapi.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -59,6 +64,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -69,6 +77,23 @@ CACHES = {
         }
     }
 }
+if not os.getenv('REDIS_URL'):
+    # Throttling, invalidation broadcasts and token revocation only cover
+    # one process without the shared cache, which is fine for development
+    # and the test suite but nowhere else.
+    if not (DEBUG or sys.argv[1:2] == ['test']):
+        raise ImproperlyConfigured("REDIS_URL must be set unless DEBUG is TRUE.")
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+OBJECT_CACHE_TIMEOUT = int(os.getenv('OBJECT_CACHE_TIMEOUT', 60 * 15))
+CACHE_LOCK_TIMEOUT = int(os.getenv('CACHE_LOCK_TIMEOUT', 5))
+CACHE_LOCK_WAIT = float(os.getenv('CACHE_LOCK_WAIT', 1.0))
+# Per-worker copies of hot cache entries; invalidations are broadcast, the
+# TTL bounds staleness if a broadcast is missed.
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', 10000))
+LOCAL_CACHE_TTL = float(os.getenv('LOCAL_CACHE_TTL', 5))
+LOOKUP_CACHE_CHECK_INTERVAL = float(os.getenv('LOOKUP_CACHE_CHECK_INTERVAL', 1.0))
+USER_STATE_CACHE_TIMEOUT = int(os.getenv('USER_STATE_CACHE_TIMEOUT', 30))
 
 CSRF_COOKIE_SECURE = True
 SESSION_COOKIE_SECURE = True
@@ -92,18 +117,43 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'api.wsgi.application'
+ASGI_APPLICATION = 'api.asgi.application'
+
+# Threads available to the async views for ORM and other blocking work.
+ASYNC_ORM_WORKERS = int(os.getenv('ASYNC_ORM_WORKERS', 8))
 
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# DATABASE_URL selects the primary; DATABASE_REPLICA_URLS is an optional
+# comma-separated list of read replicas of it. Connections are kept open
+# for CONN_MAX_AGE seconds instead of being opened on every request.
+CONN_MAX_AGE = int(os.getenv('CONN_MAX_AGE', 60))
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': dj_database_url.config(
+        default='sqlite:///%s' % os.path.join(BASE_DIR, 'db.sqlite3'), conn_max_age=CONN_MAX_AGE),
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Threads cannot share an in-memory test database, and the checkout
+    # concurrency test runs many.
+    DATABASES['default']['TEST'] = {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')}
+
+DATABASE_REPLICAS = []
+for number, url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    alias = 'replica%d' % number
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=CONN_MAX_AGE)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['restapi.routers.ReplicaRouter']
+
+# How long a client's reads stay on the primary after it writes, so it
+# reads its own writes while the replicas catch up.
+READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+
 
 
 # Password validation
@@ -147,6 +197,11 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Widths, in pixels, of the resized copies made of each product image, and
+# the number of background threads making them.
+IMAGE_VARIANT_WIDTHS = (160, 320, 640)
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
@@ -186,16 +241,26 @@ CORS_PREFLIGHT_MAX_AGE = 86400
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'restapi.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle'
+        'restapi.throttling.GCRAUserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '1000/day'
-    }
+    },
 }
 
+# Requests each worker reserves per Redis round trip when throttling; 1 checks
+# every request against Redis.
+THROTTLE_LOCAL_BATCH = int(os.getenv('THROTTLE_LOCAL_BATCH', 1))
+
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 500))
+# Render product and order list pages from values() rows instead of model
+# instances; set to FALSE to fall back to the DRF serializers.
+COMPILED_SERIALIZERS = os.getenv('COMPILED_SERIALIZERS', 'TRUE') == 'TRUE'
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=90 ),
@@ -0,0 +1,174 @@
+"""
+Async read views for the catalog, served when the project runs under ASGI
+(e.g. ``gunicorn api.asgi:application -k uvicorn.workers.UvicornWorker``).
+
+Cache reads go through an asyncio Redis client, so a hit never blocks the
+event loop. Everything that needs the ORM, including authentication and
+throttling, runs in a bounded thread pool of ASYNC_ORM_WORKERS threads, so
+slow queries queue there instead of pinning the worker.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from .cache import compute_etag, get_cached_json, get_model_version, make_json_key, needs_refresh, version_key
+from .localcache import local_cache
+from .lookups import categories
+from .metrics import record_cache_lookup
+from .models import Category, Product
+from .serializer import CategorySerializer, ProductSerializer
+from .throttling import GCRAUserRateThrottle
+from .views import ProductListView
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_ORM_WORKERS', 8), thread_name_prefix='restapi-orm')
+
+
+def _call_in_pool(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """Run a blocking callable in the bounded ORM thread pool."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables, such as the replica routing flag, into the pool.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, partial(context.run, _call_in_pool, func, args, kwargs))
+
+
+class AsyncCacheReader:
+    """
+    Read values written by the default django_redis cache without blocking
+    the event loop. Other cache backends are read in the thread pool.
+    """
+
+    def __init__(self):
+        self._clients = {}
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            from redis import asyncio as aioredis
+            options = settings.CACHES['default'].get('OPTIONS', {})
+            client = aioredis.Redis.from_url(
+                settings.CACHES['default']['LOCATION'], password=options.get('PASSWORD'))
+            self._clients[loop] = client
+        return client
+
+    @property
+    def redis_backed(self):
+        return settings.CACHES['default']['BACKEND'] == 'django_redis.cache.RedisCache'
+
+    async def get(self, key):
+        if not self.redis_backed:
+            return await run_sync(cache.get, key)
+        value = await self._client().get(cache.make_key(key))
+        return None if value is None else cache.client.decode(value)
+
+    async def get_many(self, keys):
+        if not self.redis_backed:
+            values = await run_sync(cache.get_many, keys)
+            return [values.get(key) for key in keys]
+        values = await self._client().mget([cache.make_key(key) for key in keys])
+        return [None if value is None else cache.client.decode(value) for value in values]
+
+
+cache_reader = AsyncCacheReader()
+
+
+class AccessGate(APIView):
+    """Carries the authentication, permission and throttle policy of the sync views."""
+
+    throttle_classes = [GCRAUserRateThrottle]
+    permission_classes = (IsAuthenticated, )
+
+
+def check_access(request):
+    """
+    Authenticate, authorize and throttle ``request`` exactly as an APIView
+    would. Returns an error response, or None when the request may proceed.
+    """
+    gate = AccessGate()
+    gate.args, gate.kwargs, gate.headers = (), {}, {}
+    drf_request = gate.initialize_request(request)
+    gate.request = drf_request
+    try:
+        gate.initial(drf_request)
+    except Exception as exc:
+        response = gate.finalize_response(drf_request, gate.handle_exception(exc))
+        return response.render()
+    return None
+
+
+async def model_etag(request, *models):
+    versions = await cache_reader.get_many([version_key(model) for model in models])
+    if None in versions:
+        versions = await run_sync(lambda: [get_model_version(model) for model in models])
+    return quote_etag(compute_etag(versions, request.get_full_path()))
+
+
+def _call_view(view, request, kwargs):
+    response = view(request, **kwargs)
+    if hasattr(response, 'render'):
+        response = response.render()
+    return response
+
+
+product_list_view = ProductListView.as_view()
+
+
+async def product_list(request):
+    return await run_sync(_call_view, product_list_view, request, {})
+
+
+async def product_detail(request, pk):
+    denied = await run_sync(check_access, request)
+    if denied is not None:
+        return denied
+    etag = await model_etag(request, Product)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        key = make_json_key(Product, pk)
+        body = local_cache.get(key)
+        if body is not None:
+            record_cache_lookup(Product, True, local=True)
+        else:
+            entry = await cache_reader.get(key)
+            if entry is not None and not needs_refresh(entry):
+                record_cache_lookup(Product, True)
+                body = entry[0]
+                local_cache.set(key, body)
+        if body is None:
+            try:
+                body = await run_sync(get_cached_json, Product, pk, ProductSerializer)
+            except Product.DoesNotExist:
+                return HttpResponse(status=404)
+        response = HttpResponse(body, content_type='application/json')
+    response.headers.setdefault('ETag', etag)
+    return response
+
+
+async def category_list(request):
+    denied = await run_sync(check_access, request)
+    if denied is not None:
+        return denied
+    etag = await model_etag(request, Category)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        body = await run_sync(categories.rendered, CategorySerializer)
+        response = HttpResponse(body, content_type='application/json')
+    response.headers.setdefault('ETag', etag)
+    return response
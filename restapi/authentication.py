@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+# How long a user's active flag is trusted from the cache. post_save and
+# post_delete on the user clear it straight away; the timeout only bounds
+# changes made without signals, such as queryset.update().
+USER_STATE_CACHE_TIMEOUT = getattr(settings, 'USER_STATE_CACHE_TIMEOUT', 30)
+
+USER_MISSING = 'missing'
+
+
+def user_state_key(user_id):
+    return 'user-state:%s' % user_id
+
+
+def get_user_state(user_id):
+    """
+    Return True if the user is active, False if deactivated and
+    USER_MISSING if there is no such user, from the cache when possible.
+    """
+    key = user_state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        # Always ask the primary so a revocation is never missed on a lagging replica.
+        users = get_user_model().objects.using(DEFAULT_DB_ALIAS)
+        is_active = users.filter(pk=user_id).values_list('is_active', flat=True).first()
+        state = USER_MISSING if is_active is None else is_active
+        cache.set(key, state, USER_STATE_CACHE_TIMEOUT)
+    return state
+
+
+def invalidate_user_state(user_id):
+    cache.delete(user_state_key(user_id))
+
+
+class StatelessJWTAuthentication(JWTTokenUserAuthentication):
+    """
+    Authenticate from the token's signed claims, returning the TokenUser
+    configured in SIMPLE_JWT instead of loading the User row. Only the
+    user's active flag is checked, through the shared cache, so a
+    deactivated or deleted user is locked out within seconds.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        state = get_user_state(user.pk)
+        if state == USER_MISSING:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not state:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
@@ -0,0 +1,208 @@
+import hashlib
+import math
+import random
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from .localcache import local_cache
+from .metrics import record_cache_lookup
+from .routers import primary_reads
+
+# Bump a model's version whenever the shape of its cached value changes so
+# that stale entries written by older code are never read back.
+CACHE_KEY_VERSIONS = {
+    'product': 2,
+    'shippingaddress': 2,
+    'productreview': 2,
+    'orderitem': 2,
+}
+
+OBJECT_CACHE_TIMEOUT = getattr(settings, 'OBJECT_CACHE_TIMEOUT', 60 * 15)
+# How long a worker may hold the lock to recompute an entry, and how long
+# other workers wait for it before computing the value themselves.
+CACHE_LOCK_TIMEOUT = getattr(settings, 'CACHE_LOCK_TIMEOUT', 5)
+CACHE_LOCK_WAIT = getattr(settings, 'CACHE_LOCK_WAIT', 1.0)
+CACHE_LOCK_POLL_INTERVAL = 0.02
+# Larger values refresh entries earlier; 1.0 is the usual choice.
+EARLY_REFRESH_BETA = getattr(settings, 'CACHE_EARLY_REFRESH_BETA', 1.0)
+
+
+def make_key(model, pk):
+    name = model._meta.model_name
+    return '%s:v%s:%s' % (name, CACHE_KEY_VERSIONS.get(name, 1), pk)
+
+
+def make_json_key(model, pk):
+    return make_key(model, pk) + ':json'
+
+
+def get_cached_object(model, pk):
+    """
+    Return the instance of ``model`` with primary key ``pk``, reading through
+    the cache. Raises ``model.DoesNotExist`` if there is no such row.
+    """
+    return cache_aside(make_key(model, pk), lambda: model.objects.get(pk=pk), model)
+
+
+def get_cached_json(model, pk, serializer_class):
+    """
+    Return the rendered JSON body of ``serializer_class`` for the instance of
+    ``model`` with primary key ``pk``. Hits are served straight from the cache
+    without touching the ORM or the serializer. Raises ``model.DoesNotExist``
+    if there is no such row.
+    """
+    def render():
+        return JSONRenderer().render(serializer_class(model.objects.get(pk=pk)).data)
+
+    # Bodies are immutable bytes, so the worker-local tier can hand out the
+    # same object to every request; instances are only read through the
+    # shared cache.
+    key = make_json_key(model, pk)
+    body = local_cache.get(key)
+    if body is not None:
+        record_cache_lookup(model, True, local=True)
+        return body
+    return cache_aside(key, render, model, local=True)
+
+
+def generation_key(key):
+    return key + ':generation'
+
+def needs_refresh(entry, beta=EARLY_REFRESH_BETA):
+    """
+    Decide whether to recompute a cached ``(value, delta, expires)`` entry
+    ahead of its expiry. The odds rise as expiry nears and with how long the
+    value took to compute (``delta``), so one request usually refreshes a
+    hot key before it disappears and a crowd never misses it at once.
+    """
+    value, delta, expires = entry
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires
+
+
+def cache_aside(key, compute, model, timeout=OBJECT_CACHE_TIMEOUT, local=False):
+    """
+    Return the value cached under ``key``, calling ``compute`` to fill it
+    in on a miss. Only the worker holding a short lock recomputes; the
+    others serve the stale value if there is one, or wait for the new value
+    for up to CACHE_LOCK_WAIT seconds. ``compute`` always reads from the
+    primary database. With ``local``, values read from or written to the
+    shared cache are also kept in the worker-local tier.
+    """
+    found = cache.get_many([key, generation_key(key)])
+    entry = found.get(key)
+    if entry is not None and not needs_refresh(entry):
+        record_cache_lookup(model, True)
+        if local:
+            local_cache.set(key, entry[0])
+        return entry[0]
+    record_cache_lookup(model, False)
+
+    lock_key = key + ':lock'
+    if cache.add(lock_key, 1, CACHE_LOCK_TIMEOUT):
+        try:
+            began = time.time()
+            with primary_reads():
+                value = compute()
+            now = time.time()
+            # An invalidation since the lookup means the value may predate
+            # the write behind it; storing it would outlive that delete.
+            if cache.get(generation_key(key)) == found.get(generation_key(key)):
+                cache.set(key, (value, now - began, now + timeout), timeout)
+                if local:
+                    local_cache.set(key, value)
+            return value
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        return entry[0]
+
+    deadline = time.monotonic() + CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(CACHE_LOCK_POLL_INTERVAL)
+        found = cache.get_many([key, lock_key])
+        if key in found:
+            if local:
+                local_cache.set(key, found[key][0])
+            return found[key][0]
+        if lock_key not in found:
+            # The lock holder failed, e.g. with DoesNotExist; find out ourselves.
+            break
+    with primary_reads():
+        return compute()
+
+
+def invalidate_cached_object(model, pk):
+    invalidate_cached_objects(model, [pk])
+
+
+def invalidate_cached_objects(model, pks):
+    keys = []
+    for pk in pks:
+        keys += [make_key(model, pk), make_json_key(model, pk)]
+    if keys:
+        # New generations make refills computed before this point discard
+        # their values instead of caching them after the delete.
+        generation = uuid.uuid4().hex
+        cache.set_many({generation_key(key): generation for key in keys}, OBJECT_CACHE_TIMEOUT)
+        cache.delete_many(keys)
+        local_cache.invalidate(keys)
+
+
+def expire_cached_objects(model, pks=()):
+    """
+    Expire the cached rows ``pks`` of ``model`` and bump its version once
+    the current transaction commits. For writes that send no post_save or
+    post_delete, such as queryset.update(), bulk_create() and bulk_update().
+    """
+    pks = list(pks)
+
+    def expire():
+        invalidate_cached_objects(model, pks)
+        bump_model_version(model)
+    transaction.on_commit(expire)
+
+
+def version_key(model):
+    return 'version:%s' % model._meta.model_name
+
+
+def get_model_version(model):
+    """
+    Return the current version counter of ``model``. The counter changes
+    every time a row of the model is saved or deleted.
+    """
+    key = version_key(model)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a counter lost to eviction never repeats
+        # a value handed out before.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_model_version(model):
+    key = version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+
+
+def model_etag(*models):
+    """
+    Build an ``etag_func`` for ``django.views.decorators.http.condition``
+    that changes whenever any of ``models`` changes. The request path and
+    query string are part of the tag so each page of a listing has its own.
+    """
+    def etag_func(request, *args, **kwargs):
+        return compute_etag([get_model_version(model) for model in models], request.get_full_path())
+    return etag_func
+
+
+def compute_etag(versions, full_path):
+    value = '%s|%s' % (':'.join(map(str, versions)), full_path)
+    return hashlib.md5(value.encode()).hexdigest()
@@ -0,0 +1,60 @@
+import uuid
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from .cache import expire_cached_objects
+from .lookups import order_statuses
+from .models import Order, OrderItem, OrderStatus, Product
+
+CHECKOUT_ORDER_STATUS = getattr(settings, 'CHECKOUT_ORDER_STATUS', 'pending')
+
+
+class OutOfStock(Exception):
+
+    def __init__(self, productIDs):
+        self.productIDs = productIDs
+        super().__init__('Insufficient stock for products %s' % ', '.join(map(str, productIDs)))
+
+
+def place_order(customer_id, quantities):
+    """
+    Turn ``quantities``, a mapping of productID to quantity, into an Order
+    with one OrderItem per product, reserving the stock as it goes.
+
+    All lines are reserved by one conditional UPDATE that only decrements a
+    product whose stock covers its quantity. If fewer rows change than there
+    are lines, the transaction is rolled back and OutOfStock is raised, so
+    stock can never go negative and no row is locked for longer than the
+    UPDATE and two INSERTs take.
+    """
+    productIDs = sorted(quantities)
+    in_stock = Q()
+    for productID in productIDs:
+        in_stock |= Q(pk=productID, stock__gte=quantities[productID])
+    new_stock = Case(
+        *[When(pk=productID, then=F('stock') - quantities[productID]) for productID in productIDs],
+        default=F('stock'))
+    try:
+        status = order_statuses.get_by_name(CHECKOUT_ORDER_STATUS)
+    except OrderStatus.DoesNotExist:
+        status = None
+
+    try:
+        with transaction.atomic():
+            reserved = Product.objects.filter(in_stock).update(stock=new_stock)
+            if reserved != len(productIDs):
+                raise OutOfStock(productIDs)
+            order = Order.objects.create(orderID=uuid.uuid4().hex, customer_id=customer_id, order_status=status)
+            OrderItem.objects.bulk_create([
+                OrderItem(orderItemID=uuid.uuid4().hex, order=order, product_id=productID,
+                          quantity=quantities[productID])
+                for productID in productIDs
+            ])
+    except OutOfStock:
+        # Work out which lines fell short now that the partial UPDATE has
+        # been rolled back.
+        available = dict(Product.objects.filter(pk__in=productIDs).values_list('pk', 'stock'))
+        raise OutOfStock([pk for pk in productIDs if available.get(pk, 0) < quantities[pk]]) from None
+
+    expire_cached_objects(Product, productIDs)
+    return order
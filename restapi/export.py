@@ -0,0 +1,45 @@
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+
+PRODUCT_EXPORT_FIELDS = (
+    'productID', 'product_name', 'product_description', 'product_price',
+    'product_price_currency', 'stock', 'product_image', 'category', 'status',
+)
+
+
+class Echo:
+    """A file-like object whose write() hands back the value written."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(fields, rows, batch_size):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(dict(zip(fields, row))))
+        if len(batch) >= batch_size:
+            yield '\n'.join(batch) + '\n'
+            batch = []
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+
+def iter_csv(fields, rows, batch_size):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
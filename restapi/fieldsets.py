@@ -0,0 +1,163 @@
+"""
+Sparse fieldsets and expansion of related objects.
+
+``?fields=a,b`` limits a response to the named fields, and ``?expand=c``
+replaces the related key ``c`` with the related object. Serializers opt in
+through FieldSetMixin, which also narrows the queryset to match: only the
+columns behind the selected fields are loaded, and expanded relations are
+joined or prefetched instead of fetched row by row.
+"""
+from rest_framework import serializers
+
+
+def split_names(value):
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+def parse_fieldsets(params, serializer_class):
+    """
+    Read the ``fields`` and ``expand`` query parameters for
+    ``serializer_class``. Returns the serializer keyword arguments and a dict
+    of errors for unknown names.
+    """
+    options = {}
+    errors = {}
+    expandable = serializer_class.expandable_fields
+    expand = split_names(params.get('expand', ''))
+    unknown = [name for name in expand if name not in expandable]
+    if unknown:
+        errors['expand'] = ['Unknown field: %s.' % name for name in unknown]
+    elif expand:
+        options['expand'] = expand
+    fields = split_names(params.get('fields', ''))
+    if fields:
+        known = serializer_class.selectable_fields()
+        unknown = [name for name in fields if name not in known]
+        if unknown:
+            errors['fields'] = ['Unknown field: %s.' % name for name in unknown]
+        else:
+            options['fields'] = fields
+    return options, errors
+
+
+def model_columns(serializer, field_columns=None):
+    """The model columns behind a model serializer's fields."""
+    field_columns = field_columns or {}
+    model_fields = {}
+    for field in serializer.Meta.model._meta.concrete_fields:
+        model_fields[field.name] = model_fields[field.attname] = field.name
+    columns = set()
+    for name, field in serializer.fields.items():
+        if name in field_columns:
+            columns.update(field_columns[name])
+        elif field.source in model_fields:
+            columns.add(model_fields[field.source])
+    return columns
+
+
+def ordering_columns(ordering):
+    if isinstance(ordering, str):
+        ordering = (ordering,)
+    return [name.lstrip('-') for name in ordering]
+
+
+class Expansion:
+    """
+    How to expand one field: ``field`` builds the field rendering the related
+    object, loaded by joining ``select_related`` or by running the queryset
+    method ``queryset_method``. Fields rendered without touching the
+    database, such as lookups, need neither.
+    """
+
+    def __init__(self, field, select_related=None, queryset_method=None):
+        self.field = field
+        self.select_related = select_related
+        self.queryset_method = queryset_method
+
+
+class LookupObjectField(serializers.ReadOnlyField):
+    """Renders a lookup row, found by primary key in its registry, with ``serializer_class``."""
+
+    def __init__(self, registry, serializer_class, **kwargs):
+        self.registry = registry
+        self.serializer_class = serializer_class
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        try:
+            return self.serializer_class(self.registry.get(value)).data
+        except self.registry.model.DoesNotExist:
+            return None
+
+
+class FieldSetMixin:
+    """
+    Lets the ``fields`` and ``expand`` keyword arguments pick a subset of a
+    model serializer's fields and expand some of them. Expanded fields are
+    always included.
+    """
+    # Field name -> Expansion.
+    expandable_fields = {}
+    # Names selectable with ``fields`` that to_representation() adds itself.
+    extra_fields = ()
+    # Field name -> the model columns it reads, where that is not simply
+    # the column named by its source.
+    field_columns = {}
+    # Field name -> the queryset method that must run for it to render.
+    queryset_methods = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expand = tuple(expand)
+        for name in self.expand:
+            self.fields[name] = self.expandable_fields[name].field()
+        self.selected = None
+        if fields is not None:
+            self.selected = set(fields) | set(self.expand)
+            for name in list(self.fields):
+                if name not in self.selected:
+                    self.fields.pop(name)
+
+    @classmethod
+    def selectable_fields(cls):
+        return set(cls().fields) | set(cls.extra_fields) | set(cls.expandable_fields)
+
+    def includes(self, name):
+        return self.selected is None or name in self.selected
+
+    @classmethod
+    def narrow_queryset(cls, queryset, fields=None, expand=(), keep=()):
+        """
+        Adapt ``queryset`` to what the serializer built with ``fields`` and
+        ``expand`` renders. Columns in ``keep``, such as those the paginator
+        orders by, are always loaded.
+        """
+        serializer = cls(fields=fields, expand=expand)
+        methods = {cls.queryset_methods[name] for name in cls.queryset_methods if serializer.includes(name)}
+        related = []
+        for name in serializer.expand:
+            expansion = cls.expandable_fields[name]
+            if expansion.queryset_method is not None:
+                methods.add(expansion.queryset_method)
+            if expansion.select_related is not None:
+                related.append((expansion.select_related, serializer.fields[name]))
+        for method in sorted(methods):
+            queryset = getattr(queryset, method)()
+        if related:
+            queryset = queryset.select_related(*(relation for relation, field in related))
+        if fields is not None:
+            columns = set(keep) | {queryset.model._meta.pk.name}
+            columns.update(serializer.columns())
+            for relation, field in related:
+                columns.add(relation)
+                columns.update('%s__%s' % (relation, column) for column in model_columns(field))
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def columns(self):
+        """The model columns behind the selected fields."""
+        columns = model_columns(self, self.field_columns)
+        for name in self.extra_fields:
+            if self.includes(name):
+                columns.update(self.field_columns.get(name, ()))
+        return columns
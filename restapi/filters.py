@@ -0,0 +1,55 @@
+from decimal import Decimal, InvalidOperation
+from django.db.models import Count
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def filter_products(queryset, params):
+    """
+    Narrow a Product queryset by the ``category``, ``status``, ``currency``,
+    ``min_price``, ``max_price`` and ``in_stock`` query parameters. Returns the
+    filtered queryset and a dict of errors for malformed parameters.
+    """
+    errors = {}
+    for name in ('category', 'status'):
+        value = params.get(name)
+        if value is None:
+            continue
+        try:
+            queryset = queryset.filter(**{name: int(value)})
+        except ValueError:
+            errors[name] = ['A valid integer is required.']
+    if params.get('currency'):
+        queryset = queryset.filter(product_price_currency=params['currency'].upper())
+    for name, lookup in (('min_price', 'product_price__gte'), ('max_price', 'product_price__lte')):
+        value = params.get(name)
+        if value is None:
+            continue
+        try:
+            amount = Decimal(value)
+        except InvalidOperation:
+            amount = None
+        if amount is None or not amount.is_finite():
+            errors[name] = ['A valid number is required.']
+        else:
+            queryset = queryset.filter(**{lookup: amount})
+    if params.get('in_stock', '').lower() in TRUE_VALUES:
+        queryset = queryset.filter(stock__gt=0)
+    return queryset, errors
+
+
+def product_facets(queryset):
+    """
+    Count the products in ``queryset`` per category and per status with a
+    single grouped query.
+    """
+    categories = {}
+    statuses = {}
+    rows = queryset.order_by().values('category', 'status').annotate(count=Count('productID'))
+    for row in rows:
+        categories[row['category']] = categories.get(row['category'], 0) + row['count']
+        statuses[row['status']] = statuses.get(row['status'], 0) + row['count']
+    return {
+        'category': [{'id': pk, 'count': count} for pk, count in categories.items()],
+        'status': [{'id': pk, 'count': count} for pk, count in statuses.items()],
+    }
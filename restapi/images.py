@@ -0,0 +1,98 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from .cache import expire_cached_objects
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANT_WIDTHS = getattr(settings, 'IMAGE_VARIANT_WIDTHS', (160, 320, 640))
+# (extension, Pillow format, save options)
+IMAGE_VARIANT_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2), thread_name_prefix='restapi-images')
+
+
+def image_storage():
+    return Product._meta.get_field('product_image').storage
+
+
+def schedule_image_variants(product, stale_variants=None):
+    """
+    Generate the resized variants of ``product``'s image in the background
+    once the current transaction commits, then delete ``stale_variants``,
+    the variants of the image it replaced.
+    """
+    image_name = product.product_image.name
+    if not image_name:
+        return
+    transaction.on_commit(
+        lambda: executor.submit(_generate_in_pool, product.pk, image_name, stale_variants or {}))
+
+
+def _generate_in_pool(productID, image_name, stale_variants):
+    close_old_connections()
+    try:
+        generate_image_variants(productID, image_name, stale_variants)
+    except Exception:
+        logger.exception('Could not generate image variants for product %s', productID)
+    finally:
+        close_old_connections()
+
+
+def generate_image_variants(productID, image_name, stale_variants=None):
+    """
+    Write a WebP and a JPEG copy of ``image_name`` at each configured width
+    narrower than the original, next to it in the same storage, and record
+    their names on the product. Returns the variants as
+    ``{width: {extension: name}}``.
+    """
+    storage = image_storage()
+    with storage.open(image_name) as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original.load()
+
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    directory = os.path.join(os.path.dirname(image_name), 'variants')
+    variants = {}
+    for width in sorted(IMAGE_VARIANT_WIDTHS):
+        if width >= original.width:
+            break
+        height = max(round(original.height * width / original.width), 1)
+        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        variants[str(width)] = {}
+        for extension, image_format, options in IMAGE_VARIANT_FORMATS:
+            image = resized
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            buffer = BytesIO()
+            image.save(buffer, image_format, **options)
+            name = os.path.join(directory, '%s_%d.%s' % (stem, width, extension))
+            variants[str(width)][extension] = storage.save(name, ContentFile(buffer.getvalue()))
+
+    # Only record the variants if the product still has this image; a newer
+    # upload has its own job queued.
+    if Product.objects.filter(pk=productID, product_image=image_name).update(image_variants=variants):
+        delete_image_variants(stale_variants)
+        expire_cached_objects(Product, [productID])
+    else:
+        delete_image_variants(variants)
+    return variants
+
+
+def delete_image_variants(variants):
+    storage = image_storage()
+    for names in (variants or {}).values():
+        for name in names.values():
+            storage.delete(name)
@@ -0,0 +1,167 @@
+"""
+A small per-process cache in front of the shared one.
+
+Hot entries are kept in worker memory for up to LOCAL_CACHE_TTL seconds.
+Whenever an entry is invalidated, its key is broadcast to every worker so
+they drop their copies straight away; the TTL only bounds staleness if a
+message is lost. With the django_redis cache the broadcast goes over Redis
+pub/sub, otherwise over an in-process broker, which is all a single
+process (or a test) needs.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LOCAL_CACHE_MAX_ENTRIES = getattr(settings, 'LOCAL_CACHE_MAX_ENTRIES', 10000)
+LOCAL_CACHE_TTL = getattr(settings, 'LOCAL_CACHE_TTL', 5)
+INVALIDATION_CHANNEL = 'restapi:invalidate'
+
+
+class LRUCache:
+    """A thread-safe, size-bounded LRU mapping whose entries expire."""
+
+    def __init__(self, max_entries=LOCAL_CACHE_MAX_ENTRIES, ttl=LOCAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class InMemoryBroker:
+    """Delivers invalidations to subscribers in this process only."""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, keys):
+        for callback in self._subscribers:
+            callback(keys)
+
+
+class RedisBroker:
+    """Delivers invalidations to every worker through Redis pub/sub."""
+
+    def __init__(self, channel=INVALIDATION_CHANNEL):
+        self.channel = channel
+        self._callbacks = []
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def connection(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    def subscribe(self, callback):
+        self._callbacks.append(callback)
+        self.ensure_listening()
+
+    def ensure_listening(self):
+        # Listener threads do not survive a fork, so each worker starts its own.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            pubsub = self.connection().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._receive})
+            self._thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            self._pid = os.getpid()
+
+    def _receive(self, message):
+        try:
+            keys = json.loads(message['data'])
+        except ValueError:
+            logger.warning('Ignoring malformed cache invalidation %r', message['data'])
+            return
+        for callback in self._callbacks:
+            callback(keys)
+
+    def publish(self, keys):
+        self.ensure_listening()
+        self.connection().publish(self.channel, json.dumps(keys))
+
+
+def default_broker():
+    if settings.CACHES['default']['BACKEND'] == 'django_redis.cache.RedisCache':
+        return RedisBroker()
+    return InMemoryBroker()
+
+
+class TwoTierCache:
+    """
+    The local LRU tier plus the broker that keeps it coherent. Values are
+    only read from and written to the local tier; the shared cache is
+    handled by the caller.
+    """
+
+    def __init__(self, broker=None, lru=None):
+        self.lru = lru or LRUCache()
+        self.broker = broker
+        self._subscribed = False
+
+    def _ensure_broker(self):
+        if self.broker is None:
+            self.broker = default_broker()
+        if not self._subscribed:
+            self.broker.subscribe(self.lru.delete_many)
+            self._subscribed = True
+        elif isinstance(self.broker, RedisBroker):
+            self.broker.ensure_listening()
+
+    def get(self, key):
+        self._ensure_broker()
+        return self.lru.get(key)
+
+    def set(self, key, value):
+        self.lru.set(key, value)
+
+    def invalidate(self, keys):
+        """Drop ``keys`` here and tell every other worker to do the same."""
+        self.lru.delete_many(keys)
+        if keys:
+            self._ensure_broker()
+            self.broker.publish(list(keys))
+
+
+local_cache = TwoTierCache()
@@ -0,0 +1,95 @@
+import threading
+import time
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from .cache import get_model_version
+from .models import Category, Status, OrderStatus
+from .routers import primary_reads
+
+# How long a worker trusts its copy before comparing it with the shared
+# version counter again.
+CHECK_INTERVAL = getattr(settings, 'LOOKUP_CACHE_CHECK_INTERVAL', 1.0)
+
+
+class LookupRegistry:
+    """
+    A per-process copy of a small, rarely changing table.
+
+    Rows are loaded once and reused until the model's shared version counter,
+    bumped by post_save/post_delete, moves on. The counter itself is read at
+    most once every CHECK_INTERVAL seconds, so steady-state lookups touch
+    neither the database nor the cache.
+    """
+
+    def __init__(self, model, name_field):
+        self.model = model
+        self.name_field = name_field
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        # (rows by pk, rows by name, rendered bodies by serializer class),
+        # swapped as one so readers never mix two versions.
+        self._state = ({}, {}, {})
+
+    def __deepcopy__(self, memo):
+        # Serializer fields are deep-copied per serializer instance; every
+        # copy must keep sharing this process-wide registry.
+        return self
+
+    def _load(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < CHECK_INTERVAL:
+            return self._state
+        with self._lock:
+            if self._version is None or now - self._checked_at >= CHECK_INTERVAL:
+                # Read the version before the rows so a concurrent change is
+                # picked up on the next check rather than lost.
+                version = get_model_version(self.model)
+                if version != self._version:
+                    # A replica could hand back rows older than the version.
+                    with primary_reads():
+                        objects = list(self.model.objects.order_by('pk'))
+                    self._state = (
+                        {obj.pk: obj for obj in objects},
+                        {getattr(obj, self.name_field): obj for obj in objects},
+                        {},
+                    )
+                    self._version = version
+                self._checked_at = now
+            return self._state
+
+    def all(self):
+        return list(self._load()[0].values())
+
+    def get(self, pk):
+        """Return the row with primary key ``pk`` or raise DoesNotExist."""
+        try:
+            return self._load()[0][pk]
+        except KeyError:
+            raise self.model.DoesNotExist(pk)
+
+    def get_by_name(self, name):
+        """Return the row whose name field equals ``name`` or raise DoesNotExist."""
+        try:
+            return self._load()[1][name]
+        except KeyError:
+            raise self.model.DoesNotExist(name)
+
+    def name(self, pk):
+        """Return the name of the row with primary key ``pk``, or None."""
+        obj = self._load()[0].get(pk)
+        return getattr(obj, self.name_field) if obj is not None else None
+
+    def rendered(self, serializer_class):
+        """Return every row rendered as a JSON list by ``serializer_class``."""
+        by_pk, by_name, rendered = self._load()
+        body = rendered.get(serializer_class)
+        if body is None:
+            data = serializer_class(list(by_pk.values()), many=True).data
+            body = rendered[serializer_class] = JSONRenderer().render(data)
+        return body
+
+
+categories = LookupRegistry(Category, 'category_name')
+statuses = LookupRegistry(Status, 'status_name')
+order_statuses = LookupRegistry(OrderStatus, 'order_status_name')
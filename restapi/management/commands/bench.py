@@ -0,0 +1,268 @@
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases
+from djmoney.money import Money
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+from restapi import images, urls
+from restapi.metrics import QueryRecorder, recording
+from restapi.models import Product
+from restapi.seeding import SEED_CURRENCY, WORDS, Seeder
+from restapi.throttling import GCRAUserRateThrottle
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and benchmark every route in "
+        "restapi/urls.py at a fixed concurrency with the Django test client. "
+        "Prints p50/p95/p99 latency, throughput and queries per request as "
+        "JSON, to be diffed between commits. Runs against a private in-memory "
+        "cache, or against the Redis database given by --redis-url, which is "
+        "flushed; the configured cache is never touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="requests per route")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=2000)
+        parser.add_argument('--routes', help="comma-separated route names; defaults to every route")
+        parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+        parser.add_argument(
+            '--redis-url', help="a dedicated Redis database to benchmark the Redis cache paths on; it is flushed")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        if connection.vendor == 'sqlite' and not connection.settings_dict['TEST']['NAME']:
+            # Threads cannot share an in-memory database, so use a file.
+            connection.settings_dict['TEST']['NAME'] = tempfile.mktemp(suffix='.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False)
+        rates = GCRAUserRateThrottle.THROTTLE_RATES
+        # Measure the views, not the daily request quota.
+        GCRAUserRateThrottle.THROTTLE_RATES = dict(rates, user='100000000/day')
+        try:
+            self.rng = random.Random(options['seed'])
+            # Keep uploads and their image variants out of the real media
+            # root, and cache entries out of the real cache.
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root, CACHES=self.caches(options)):
+                cache.clear()
+                self.seed_dataset(options)
+                report = self.run(options)
+                images.executor.shutdown(wait=True)
+        finally:
+            GCRAUserRateThrottle.THROTTLE_RATES = rates
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+
+        body = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(body + '\n')
+        else:
+            self.stdout.write(body)
+
+    def caches(self, options):
+        if not options['redis_url']:
+            return {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'}}
+        default = dict(settings.CACHES['default'])
+        if default['BACKEND'] != 'django_redis.cache.RedisCache':
+            default = {'BACKEND': 'django_redis.cache.RedisCache',
+                       'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'}}
+        default['LOCATION'] = options['redis_url']
+        return {'default': default}
+
+    def seed_dataset(self, options):
+        n = options['requests']
+        # Seed n spare reviews and addresses beyond the requested counts for
+        # the delete routes to consume.
+        seeder = Seeder(
+            seed=options['seed'], products=options['products'], users=options['users'], orders=options['orders'],
+            reviews=options['reviews'] + n, addresses=2 * n, categories=20)
+        counts = seeder.run()
+        # Checkouts should measure the reservation, not run out of stock.
+        Product.objects.update(stock=10 ** 6)
+        # The first seeded user is the most frequent customer.
+        self.user = User.objects.get(pk=seeder.user_ids[0])
+        self.user.set_password(BENCH_PASSWORD)
+        self.user.save()
+        self.categories = seeder.category_ids
+        self.products = seeder.product_ids
+        # order-detail looks up an OrderItem.
+        self.order_items = [str(pk) for pk in range(1, counts['order_items'] + 1)]
+        self.reviews = [str(pk) for pk in range(1, options['reviews'] + 1)]
+        self.deletable_reviews = [str(pk) for pk in range(options['reviews'] + 1, options['reviews'] + n + 1)]
+        self.addresses = [str(pk) for pk in range(1, n + 1)]
+        self.deletable_addresses = [str(pk) for pk in range(n + 1, 2 * n + 1)]
+        Product.objects.bulk_create([
+            Product(product_name='doomed %d' % i, product_description='', product_price=Money(1, SEED_CURRENCY),
+                    product_image='images/bench.png')
+            for i in range(n)
+        ])
+        self.deletable_products = list(
+            Product.objects.filter(product_name__startswith='doomed ').values_list('pk', flat=True))
+
+        image = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 80, 40)).save(image, 'PNG')
+        self.image = image.getvalue()
+        self.refresh = str(RefreshToken.for_user(self.user))
+        self.token = 'Bearer %s' % RefreshToken.for_user(self.user).access_token
+
+    def requests(self):
+        """
+        Map each route name to a function building the i-th request against
+        it as (method, path, data, content_type).
+        """
+        rng = self.rng
+        product = lambda: rng.choice(self.products)
+        return {
+            'user-register': lambda i: ('post', '/api/v1/user-register/', {
+                'email': 'bench%06d@example.com' % i, 'username': 'bench%06d' % i, 'password': 'password'}, None),
+            'product-list': lambda i: ('get', '/api/v1/product-list/', {'category': str(rng.choice(self.categories))}, None),
+            'product-search': lambda i: ('get', '/api/v1/product-search/', {'q': rng.choice(WORDS)}, None),
+            'product-export': lambda i: ('get', '/api/v1/product-export/ndjson/', None, None),
+            'product-detail': lambda i: ('get', '/api/v1/product-detail/%d/' % product(), None, None),
+            'product-create': lambda i: ('post', '/api/v1/product-create/', self.product_form(i), None),
+            'product-update': lambda i: ('post', '/api/v1/product-update/%d/' % product(), self.product_form(i), None),
+            'product-delete': lambda i: ('delete', '/api/v1/product-delete/%d/' % self.deletable_products[i], None, None),
+            'product-bulk-create': lambda i: ('post', '/api/v1/product-bulk-create/', [
+                {'product_name': 'bulk %d-%d' % (i, j), 'product_description': 'bulk product', 'product_price': '1.00',
+                 'product_price_currency': 'KES', 'stock': 10} for j in range(50)], 'application/json'),
+            'product-bulk-update': lambda i: ('post', '/api/v1/product-bulk-update/', [
+                {'productID': pk, 'stock': 10 ** 6} for pk in rng.sample(self.products, 50)], 'application/json'),
+            'product-reviews': lambda i: ('get', '/api/v1/product-reviews/%d/' % product(), None, None),
+            'review-detail': lambda i: ('get', '/api/v1/review-detail/%s/' % rng.choice(self.reviews), None, None),
+            'review-create': lambda i: ('post', '/api/v1/review-create/', {
+                'reviewID': 'bench-%d' % i, 'product': product(), 'customer': self.user.pk,
+                'review': 'new review', 'rating': rng.randint(1, 5)}, None),
+            'review-delete': lambda i: ('delete', '/api/v1/review-delete/%s/' % self.deletable_reviews[i], None, None),
+            'category-list': lambda i: ('get', '/api/v1/category-list/', None, None),
+            'order-list': lambda i: ('get', '/api/v1/order-list/', None, None),
+            'my-orders': lambda i: ('get', '/api/v1/my-orders/', None, None),
+            'checkout': lambda i: ('post', '/api/v1/checkout/', {
+                'items': [{'product': pk, 'quantity': rng.randint(1, 3)} for pk in rng.sample(self.products, 3)]},
+                'application/json'),
+            'order-detail': lambda i: ('get', '/api/v1/order-detail/%s/' % rng.choice(self.order_items), None, None),
+            'address-detail': lambda i: ('get', '/api/v1/address-detail/%s/' % rng.choice(self.addresses), None, None),
+            'address-create': lambda i: ('post', '/api/v1/address-create/', self.address_form('bench-%d' % i), None),
+            'address-update': lambda i: (
+                'post', '/api/v1/address-update/%s/' % self.addresses[i], self.address_form(self.addresses[i]), None),
+            'address-delete': lambda i: (
+                'delete', '/api/v1/address-delete/%s/' % self.deletable_addresses[i], None, None),
+            'async-product-list': lambda i: ('get', '/api/v1/async/product-list/', None, None),
+            'async-product-detail': lambda i: ('get', '/api/v1/async/product-detail/%d/' % product(), None, None),
+            'async-category-list': lambda i: ('get', '/api/v1/async/category-list/', None, None),
+            'token': lambda i: ('post', '/api/v1/token/', {
+                'username': self.user.username, 'password': BENCH_PASSWORD}, None),
+            'token-refresh': lambda i: ('post', '/api/v1/token/refresh/', {'refresh': self.refresh}, None),
+        }
+
+    def product_form(self, i):
+        return {
+            'product_name': 'uploaded %d' % i, 'product_description': 'uploaded product',
+            'product_price': '9.99', 'product_price_currency': 'KES', 'stock': 10,
+            'product_image': SimpleUploadedFile('bench-%d.png' % i, self.image, 'image/png'),
+        }
+
+    def address_form(self, addressID):
+        return {
+            'addressID': addressID, 'customer': self.user.pk, 'address': '1 Bench Road', 'city': 'Nairobi',
+            'state': 'Nairobi', 'zipcode': '00100', 'phone_number': '+254700000000', 'country': 'Kenya',
+        }
+
+    def run(self, options):
+        builders = self.requests()
+        names = [pattern.name for pattern in urls.urlpatterns]
+        missing = [name for name in names if name not in builders]
+        if missing:
+            raise CommandError("No benchmark request for routes: %s" % ', '.join(missing))
+        if options['routes']:
+            names = options['routes'].split(',')
+            unknown = [name for name in names if name not in builders]
+            if unknown:
+                raise CommandError("Unknown routes: %s" % ', '.join(unknown))
+
+        report = {
+            'config': {key: options[key] for key in
+                       ('requests', 'concurrency', 'seed', 'products', 'users', 'orders', 'reviews')},
+            'database': connection.vendor,
+            'routes': {},
+        }
+        for name in names:
+            # Build every request up front so the random draws, and so the
+            # workload, do not depend on thread scheduling.
+            prepared = [builders[name](i) for i in range(options['requests'])]
+            report['routes'][name] = self.measure(prepared, options['concurrency'])
+        return report
+
+    def measure(self, prepared, concurrency):
+        local = threading.local()
+        samples = []
+        lock = threading.Lock()
+
+        def fetch(request):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client(HTTP_AUTHORIZATION=self.token)
+            method, path, data, content_type = request
+            kwargs = {'content_type': content_type} if content_type else {}
+            if content_type == 'application/json':
+                data = json.dumps(data)
+            recorder = QueryRecorder()
+            began = time.perf_counter()
+            # Also counts queries the async views run in their thread pool.
+            with recording(recorder):
+                response = getattr(client, method)(path, data, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - began
+            with lock:
+                samples.append((elapsed, response.status_code, recorder.count))
+
+        def worker(chunk):
+            try:
+                for request in chunk:
+                    fetch(request)
+            finally:
+                connection.close()
+
+        chunks = [prepared[i::concurrency] for i in range(concurrency)]
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, chunks))
+        elapsed = time.perf_counter() - began
+
+        latencies = sorted(sample[0] * 1000 for sample in samples)
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for sample in samples if sample[1] >= 400),
+            'p50_ms': round(percentile(latencies, .50), 2),
+            'p95_ms': round(percentile(latencies, .95), 2),
+            'p99_ms': round(percentile(latencies, .99), 2),
+            'requests_per_second': round(len(samples) / elapsed, 1),
+            'queries_per_request': round(sum(sample[2] for sample in samples) / len(samples), 2),
+        }
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+from restapi.throttling import GCRAUserRateThrottle
+from rest_framework_simplejwt.tokens import AccessToken
+from restapi.models import Product
+
+BENCH_USERNAME = 'bench-async'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync (WSGI) and async (ASGI) catalog views "
+        "at a fixed number of concurrent in-flight requests, in process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--product', type=int, help="productID to fetch; defaults to the first product")
+
+    def handle(self, *args, **options):
+        product = options['product'] or Product.objects.order_by('pk').values_list('pk', flat=True).first()
+        if product is None:
+            raise CommandError("There are no products to fetch.")
+        setup_test_environment()
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        token = 'Bearer %s' % AccessToken.for_user(user)
+        routes = {
+            'product-list': ('/api/v1/product-list/', '/api/v1/async/product-list/'),
+            'product-detail': ('/api/v1/product-detail/%d/' % product, '/api/v1/async/product-detail/%d/' % product),
+            'category-list': ('/api/v1/category-list/', '/api/v1/async/category-list/'),
+        }
+        # Measure the views, not the daily request quota.
+        rates = GCRAUserRateThrottle.THROTTLE_RATES
+        GCRAUserRateThrottle.THROTTLE_RATES = dict(rates, user='100000000/day')
+        try:
+            results = {}
+            for name, (sync_path, async_path) in routes.items():
+                results[name] = {
+                    'wsgi': self.run_wsgi(sync_path, token, options['concurrency'], options['requests']),
+                    'asgi': asyncio.run(
+                        self.run_asgi(async_path, token, options['concurrency'], options['requests'])),
+                }
+        finally:
+            GCRAUserRateThrottle.THROTTLE_RATES = rates
+            # Never remove an account the command did not create.
+            if created:
+                user.delete()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_wsgi(self, path, token, concurrency, total):
+        client = Client()
+        statuses = []
+
+        def fetch(_):
+            statuses.append(client.get(path, HTTP_AUTHORIZATION=token).status_code)
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch, range(total)))
+        return self.summary(statuses, time.perf_counter() - began)
+
+    async def run_asgi(self, path, token, concurrency, total):
+        client = AsyncClient()
+        statuses = []
+        gate = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            async with gate:
+                # AsyncClient takes raw header names rather than WSGI keys.
+                statuses.append((await client.get(path, authorization=token)).status_code)
+
+        began = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(total)))
+        return self.summary(statuses, time.perf_counter() - began)
+
+    def summary(self, statuses, elapsed):
+        return {
+            'requests': len(statuses),
+            'errors': sum(1 for status in statuses if status >= 400),
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(statuses) / elapsed, 1),
+        }
@@ -0,0 +1,71 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from restapi.compiled import CompiledSerializer
+from restapi.models import Order, Product
+from restapi.serializer import OrderSerializer, ProductSerializer
+
+
+def best_of(repeat, function):
+    """The fastest of ``repeat`` timed calls, which is the least disturbed by noise."""
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - began)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the DRF serializers with their compiled counterparts on the "
+        "first --rows products and orders in the database. Checks that both "
+        "render the same bytes, then prints milliseconds per 1000 rows for "
+        "serialization alone and for fetching plus serialization, as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        cases = {
+            'product': (ProductSerializer, Product.objects.order_by('productID')),
+            'order': (OrderSerializer, Order.objects.order_by('-order_date', '-orderID')),
+        }
+        report = {}
+        for name, (serializer_class, queryset) in cases.items():
+            queryset = serializer_class.narrow_queryset(queryset)
+            report[name] = self.compare(name, serializer_class, queryset, rows, options['repeat'])
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def compare(self, name, serializer_class, queryset, rows, repeat):
+        compiled = CompiledSerializer(serializer_class())
+        instances = list(queryset[:rows])
+        values = list(compiled.values(queryset)[:rows])
+        if not instances:
+            raise CommandError("There are no %s rows to serialize; run the seed command first." % name)
+
+        renderer = JSONRenderer()
+        drf = lambda objects: renderer.render(serializer_class(objects, many=True).data)
+        fast = lambda objects: renderer.render(compiled.serialize(objects))
+        if drf(instances) != fast(values):
+            raise CommandError("Compiled %s output differs from %s." % (name, serializer_class.__name__))
+
+        per_1k = 1000.0 / len(instances)
+        timings = {
+            'serialize': (best_of(repeat, lambda: drf(instances)), best_of(repeat, lambda: fast(values))),
+            'fetch_and_serialize': (
+                best_of(repeat, lambda: drf(list(queryset[:rows]))),
+                best_of(repeat, lambda: fast(list(compiled.values(queryset)[:rows])))),
+        }
+        result = {'rows': len(instances)}
+        for stage, (drf_time, compiled_time) in timings.items():
+            result[stage] = {
+                'drf_ms_per_1k': round(drf_time * per_1k * 1000, 2),
+                'compiled_ms_per_1k': round(compiled_time * per_1k * 1000, 2),
+                'speedup': round(drf_time / compiled_time, 2),
+            }
+        return result
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from restapi.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the products' rating summary columns from the reviews "
+        "table, e.g. after reviews were changed with queryset.update() or "
+        "raw SQL, which the signals keeping the columns current never see."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('products', nargs='*', type=int, help="product IDs; defaults to every product")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = recompute_ratings(options['products'] or None, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Recomputed the ratings of %d products.' % count))
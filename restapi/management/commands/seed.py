@@ -0,0 +1,36 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from restapi.seeding import CHUNK_SIZE, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill an empty database with deterministic synthetic products, users, "
+        "orders, order items, reviews and addresses at production scale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--orders', type=int, default=200000)
+        parser.add_argument('--reviews', type=int, default=200000)
+        parser.add_argument('--addresses', type=int, help="defaults to one per user")
+        parser.add_argument('--categories', type=int, default=40)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--clear-cache', action='store_true',
+                            help="clear the default cache, which may hold objects from before a flush")
+
+    def handle(self, *args, **options):
+        if options['clear_cache']:
+            cache.clear()
+        seeder = Seeder(
+            seed=options['seed'], products=options['products'], users=options['users'],
+            orders=options['orders'], reviews=options['reviews'], addresses=options['addresses'],
+            categories=options['categories'], chunk_size=options['chunk_size'], log=self.stdout.write)
+        try:
+            counts = seeder.run()
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join('%d %s' % (count, name) for name, count in counts.items())))
@@ -0,0 +1,161 @@
+"""
+Prometheus metrics for the API.
+
+Under gunicorn, point PROMETHEUS_MULTIPROC_DIR at a directory shared by all
+workers (emptied before start-up) so every worker writes its samples there
+and /metrics reports the sum across workers rather than whichever worker
+happened to answer the scrape.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from .middleware import SyncAndAsyncMiddleware
+
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds', 'Time spent handling a request.',
+    ['route', 'method', 'status'],
+    buckets=(.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10))
+REQUEST_QUERIES = Histogram(
+    'api_request_db_queries', 'Database queries run while handling a request.',
+    ['route', 'method'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250))
+REQUEST_QUERY_TIME = Histogram(
+    'api_request_db_duration_seconds', 'Time spent in database queries while handling a request.',
+    ['route', 'method'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+RESPONSE_SIZE = Histogram(
+    'api_response_size_bytes', 'Size of response bodies, streamed ones included.',
+    ['route', 'method'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
+CACHE_REQUESTS = Counter(
+    'api_cache_requests_total', 'Object cache lookups by model and result (hit, local_hit or miss).',
+    ['model', 'result'])
+
+
+def record_cache_lookup(model, hit, local=False):
+    result = ('local_hit' if local else 'hit') if hit else 'miss'
+    CACHE_REQUESTS.labels(model._meta.model_name, result).inc()
+
+
+class QueryRecorder:
+    """Counts the queries run inside recording() and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed):
+        # Queries of one request may run in several threads at once.
+        with self._lock:
+            self.count += 1
+            self.duration += elapsed
+
+
+# The recorders of the request being handled, outermost first. Context
+# variables follow the request into sync_to_async threads and the async
+# views' ORM pool, so its queries are counted whichever thread runs them.
+current_recorders = ContextVar('current_recorders', default=())
+
+
+def record_query(execute, sql, params, many, context):
+    recorders = current_recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - began
+        for recorder in recorders:
+            recorder.add(elapsed)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+@contextmanager
+def recording(recorder):
+    """Count every query run on behalf of the current context into ``recorder``."""
+    # Connections opened before this module was imported have no wrapper yet.
+    for connection in connections.all():
+        install_query_recorder(connection)
+    token = current_recorders.set(current_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        current_recorders.reset(token)
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """Record latency, database use and response size per matched route."""
+
+    def call_sync(self, request):
+        began = time.perf_counter()
+        with recording(QueryRecorder()) as recorder:
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, began)
+
+    async def call_async(self, request):
+        began = time.perf_counter()
+        with recording(QueryRecorder()) as recorder:
+            response = await self.get_response(request)
+        return self.finish(request, response, recorder, began)
+
+    def finish(self, request, response, recorder, began):
+        if response.streaming:
+            # Most of the work happens while the body streams; views run it
+            # under stream_in_context() so its queries reach the recorder.
+            response.streaming_content = self.observe_streamed(
+                request, response, recorder, began, response.streaming_content)
+        else:
+            self.observe(request, response, recorder, time.perf_counter() - began, len(response.content))
+        return response
+
+    def observe_streamed(self, request, response, recorder, began, content):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.observe(request, response, recorder, time.perf_counter() - began, size)
+
+    def observe(self, request, response, recorder, elapsed, size):
+        # Label by URL pattern, not path, so ids don't explode the series.
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+        method = request.method
+        REQUEST_LATENCY.labels(route, method, response.status_code).observe(elapsed)
+        REQUEST_QUERIES.labels(route, method).observe(recorder.count)
+        REQUEST_QUERY_TIME.labels(route, method).observe(recorder.duration)
+        RESPONSE_SIZE.labels(route, method).observe(size)
+
+
+def metrics_registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    """Serve every metric in the Prometheus text format."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.META.get('HTTP_AUTHORIZATION') != 'Bearer %s' % token:
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
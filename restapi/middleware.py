@@ -0,0 +1,53 @@
+import asyncio
+import contextvars
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so
+    Django never wraps it in a thread hop. Subclasses implement
+    call_sync() and the coroutine call_async(); the one matching the
+    handler chain is used.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Let the handler see this instance as a coroutine function, as
+            # Django's MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.call_async(request)
+        return self.call_sync(request)
+
+    def call_sync(self, request):
+        raise NotImplementedError
+
+    async def call_async(self, request):
+        raise NotImplementedError
+
+
+def stream_in_context(iterable):
+    """
+    Iterate ``iterable`` in a copy of the current context. Streamed bodies
+    are produced after the middleware has returned and reset its context
+    variables; wrapping them in the view keeps replica routing and query
+    recording in force while they run.
+    """
+    # Copied now, not when iteration starts, which is too late.
+    context = contextvars.copy_context()
+
+    def items():
+        iterator = context.run(iter, iterable)
+        done = object()
+        while True:
+            item = context.run(next, iterator, done)
+            if item is done:
+                return
+            yield item
+    return items()
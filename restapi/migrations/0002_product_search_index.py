@@ -0,0 +1,45 @@
+from django.db import migrations
+
+SQLITE_FTS_TABLE = (
+    "CREATE VIRTUAL TABLE restapi_product_fts USING fts5(product_name, product_description)"
+)
+SQLITE_FTS_POPULATE = (
+    "INSERT INTO restapi_product_fts (rowid, product_name, product_description) "
+    "SELECT productID, product_name, product_description FROM restapi_product"
+)
+PG_GIN_INDEX = (
+    "CREATE INDEX restapi_product_search_idx ON restapi_product USING GIN "
+    "(to_tsvector('english', coalesce(product_name, '') || ' ' || coalesce(product_description, '')))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        schema_editor.execute(SQLITE_FTS_TABLE)
+        schema_editor.execute(SQLITE_FTS_POPULATE)
+    elif vendor == 'postgresql':
+        schema_editor.execute(PG_GIN_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS restapi_product_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS restapi_product_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,59 @@
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+RATING_FIELDS = ('rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+
+
+def backfill_rating_summary(apps, schema_editor):
+    Product = apps.get_model('restapi', 'Product')
+    ProductReview = apps.get_model('restapi', 'ProductReview')
+    aggregates = {'rating_count': Count('pk'), 'rating_sum': Sum('rating')}
+    for stars in range(1, 6):
+        aggregates['rating_%d' % stars] = Count('pk', filter=Q(rating=stars))
+    rows = (ProductReview.objects.filter(product__isnull=False, rating__in=range(1, 6))
+            .order_by().values('product_id').annotate(**aggregates))
+    products = []
+    for row in rows:
+        product = Product(pk=row.pop('product_id'))
+        for field, value in row.items():
+            setattr(product, field, value)
+        products.append(product)
+    Product.objects.bulk_update(products, RATING_FIELDS, batch_size=1000)
+
+
+def rating_field():
+    return models.PositiveIntegerField(default=0, editable=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0004_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productreview',
+            name='product',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='restapi.product'),
+        ),
+        migrations.AlterField(
+            model_name='productreview',
+            name='rating',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['product', 'date'], name='review_product_date_idx'),
+        ),
+        migrations.AddField(model_name='product', name='rating_count', field=rating_field()),
+        migrations.AddField(model_name='product', name='rating_sum', field=rating_field()),
+        migrations.AddField(model_name='product', name='rating_1', field=rating_field()),
+        migrations.AddField(model_name='product', name='rating_2', field=rating_field()),
+        migrations.AddField(model_name='product', name='rating_3', field=rating_field()),
+        migrations.AddField(model_name='product', name='rating_4', field=rating_field()),
+        migrations.AddField(model_name='product', name='rating_5', field=rating_field()),
+        migrations.RunPython(backfill_rating_summary, migrations.RunPython.noop),
+    ]
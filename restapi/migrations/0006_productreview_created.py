@@ -0,0 +1,45 @@
+import datetime
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_created(apps, schema_editor):
+    # Spread the reviews of each day a microsecond apart, in the order the
+    # paginator used before, so existing reviews keep their order and no two
+    # share a key.
+    ProductReview = apps.get_model('restapi', 'ProductReview')
+    reviews = []
+    day, offset = None, 0
+    for review in ProductReview.objects.only('pk', 'date').order_by('date', 'reviewID').iterator():
+        if review.date != day:
+            day, offset = review.date, 0
+        review.created = datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc) + \
+            datetime.timedelta(microseconds=offset)
+        offset += 1
+        reviews.append(review)
+    ProductReview.objects.bulk_update(reviews, ['created'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0005_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productreview',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_created, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='productreview',
+            name='review_product_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['product', 'created'], name='review_product_created_idx'),
+        ),
+    ]
@@ -1,6 +1,11 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Case, Count, F, Max, Sum, Value, When
+from django.db.models.functions import Coalesce
 from djmoney.models.fields import MoneyField
+from djmoney.money import Money
 from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator, MinValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
 
 class Status(models.Model):
@@ -19,6 +24,15 @@ class Category(models.Model):
     def __str__(self):
         return self.category_name
 
+def rating_summary(count, total, *histogram):
+    """The nested "rating" of a product from its RATING_FIELDS values."""
+    return {
+        'count': count,
+        'sum': total,
+        'average': round(total / count, 2) if count else None,
+        'histogram': {str(stars): n for stars, n in enumerate(histogram, 1)},
+    }
+
 class Product(models.Model):
     productID = models.AutoField(primary_key=True)
     product_name = models.CharField(max_length=200)
@@ -26,42 +40,130 @@ class Product(models.Model):
     product_price = MoneyField(max_digits=14, decimal_places=2, default_currency='KSH')
     stock = models.IntegerField(default=0)
     product_image = models.ImageField(upload_to='images')
+    # Resized copies of product_image as {width: {extension: storage name}},
+    # filled in by restapi.images after each upload.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     status = models.ForeignKey(Status, on_delete=models.SET_NULL, null=True)
-    
+    # Summary of the product's reviews, kept up to date by restapi.ratings as
+    # reviews are added and removed.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    RATING_FIELDS = ('rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'status', 'product_price'], name='product_cat_status_price_idx'),
+        ]
+
     def __str__(self):
         return self.product_name
 
+    @property
+    def rating_summary(self):
+        return rating_summary(*(getattr(self, name) for name in self.RATING_FIELDS))
+
 class ProductReview(models.Model):
     reviewID = models.CharField(max_length=100, primary_key=True)
-    product = models.OneToOneField(Product, on_delete=models.SET_NULL, null=True)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     review = models.TextField()
-    rating = models.IntegerField(default=0)
+    rating = models.IntegerField(default=0, validators=[MinValueValidator(1), MaxValueValidator(5)])
     date = models.DateField(auto_now_add=True)
+    # Orders a product's reviews for cursor pagination, which needs a key
+    # that increases and rarely ties; many reviews share a date.
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created'], name='review_product_created_idx'),
+        ]
 
     def __str__(self):
         return self.review
+
+def exceeds_one(expression):
+    """A condition, usable in When(), that ``expression`` is greater than one."""
+    return models.Func(expression, models.Value(1), template='%(expressions)s', arg_joiner=' > ',
+                       output_field=models.BooleanField())
+
+def order_totals(prefix=''):
+    """
+    Aggregates over order items giving the number of items, the money total
+    and its currency. ``prefix`` is the lookup path from the queried model to
+    OrderItem. Amounts in different currencies cannot be added up, so an
+    order mixing currencies gets None for both the amount and the currency.
+    """
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    currency = prefix + 'product__product_price_currency'
+    mixed = exceeds_one(Count(currency, distinct=True))
+    return {
+        'total_items': Coalesce(Sum(prefix + 'quantity'), 0),
+        'total_amount': Case(
+            When(mixed, then=Value(None)),
+            default=Coalesce(
+                Sum(F(prefix + 'quantity') * F(prefix + 'product__product_price'), output_field=amount),
+                Decimal('0.00'), output_field=amount),
+            output_field=amount),
+        'total_currency': Case(When(mixed, then=Value(None)), default=Max(currency), output_field=models.CharField()),
+    }
+
+class OrderQuerySet(models.QuerySet):
+
+    def with_totals(self):
+        """
+        Annotate each order with ``total_items``, ``total_amount`` and
+        ``total_currency``, computed in the same query that fetches the orders.
+        """
+        return self.annotate(**order_totals('orderitem__'))
+
+    def with_items(self):
+        """
+        Prefetch each order's items together with the product columns needed
+        for a summary, in one extra query.
+        """
+        items = OrderItem.objects.select_related('product').only(
+            'orderItemID', 'order', 'quantity', 'product__productID', 'product__product_name',
+            'product__product_price', 'product__product_price_currency')
+        return self.prefetch_related(models.Prefetch('orderitem_set', queryset=items))
+
 class Order(models.Model):
     orderID = models.CharField(max_length=100, primary_key=True)
     customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     order_date = models.DateTimeField(auto_now_add=True)
     order_status = models.ForeignKey(OrderStatus, on_delete=models.SET_NULL, null=True)
 
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return self.orderID
 
+    def load_totals(self):
+        """Aggregate the order's totals unless with_totals() already did."""
+        if not hasattr(self, 'total_amount'):
+            for name, value in self.orderitem_set.aggregate(**order_totals()).items():
+                setattr(self, name, value)
+
     @property
     def cart_total(self):
-       orderitems = self.orderitem_set.all()
-       total = sum([item.get_total for item in orderitems])
-       return total
+        self.load_totals()
+        if self.total_amount is None:
+            # Mixed currencies.
+            return None
+        if self.total_currency is None:
+            return 0
+        return Money(self.total_amount, self.total_currency)
 
     @property
     def cart_items(self):
-        orderitems = self.orderitem_set.all()
-        total = sum([item.quantity for item in orderitems])
-        return total
+        self.load_totals()
+        return self.total_items
 
     @property
     def shipping_order(self):
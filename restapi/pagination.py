@@ -0,0 +1,26 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ApiCursorPagination(CursorPagination):
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+
+class ProductCursorPagination(ApiCursorPagination):
+    ordering = 'productID'
+
+
+class OrderCursorPagination(ApiCursorPagination):
+    ordering = ('-order_date', '-orderID')
+
+
+class ReviewCursorPagination(ApiCursorPagination):
+    ordering = ('-created', '-reviewID')
+
+
+class SearchPagination(PageNumberPagination):
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
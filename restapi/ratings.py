@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from .cache import expire_cached_objects
+from .models import Product, ProductReview
+
+RATING_RANGE = range(1, 6)
+
+
+def apply_rating(productID, rating, sign):
+    """
+    Add (``sign`` 1) or remove (``sign`` -1) one review of ``rating`` stars
+    to the summary columns of product ``productID`` with a single UPDATE.
+    Ratings outside 1-5, and reviews of no product, are not counted.
+    """
+    if productID is None or rating not in RATING_RANGE:
+        return
+    Product.objects.filter(pk=productID).update(**{
+        'rating_count': F('rating_count') + sign,
+        'rating_sum': F('rating_sum') + sign * rating,
+        'rating_%d' % rating: F('rating_%d' % rating) + sign,
+    })
+    expire_cached_objects(Product, [productID])
+
+
+def review_rating_summaries(product_ids=None):
+    """
+    Compute the summary columns from the reviews table with one grouped
+    query, as ``{productID: {column: value}}``. Used to backfill the columns,
+    never to serve requests.
+    """
+    reviews = ProductReview.objects.filter(product__isnull=False, rating__in=RATING_RANGE)
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+    aggregates = {'rating_count': Count('pk'), 'rating_sum': Sum('rating')}
+    for stars in RATING_RANGE:
+        aggregates['rating_%d' % stars] = Count('pk', filter=Q(rating=stars))
+    rows = reviews.order_by().values('product_id').annotate(**aggregates)
+    return {row.pop('product_id'): row for row in rows}
+
+
+def recompute_ratings(product_ids=None, batch_size=1000):
+    """Rebuild the summary columns of ``product_ids``, or of every product."""
+    summaries = review_rating_summaries(product_ids)
+    empty = dict.fromkeys(Product.RATING_FIELDS, 0)
+    products = Product.objects.only('pk', *Product.RATING_FIELDS).order_by('pk')
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    changed = []
+    for product in products.iterator(chunk_size=batch_size):
+        for field, value in summaries.get(product.pk, empty).items():
+            setattr(product, field, value)
+        changed.append(product)
+    with transaction.atomic():
+        Product.objects.bulk_update(changed, Product.RATING_FIELDS, batch_size=batch_size)
+    expire_cached_objects(Product, [product.pk for product in changed])
+    return len(changed)
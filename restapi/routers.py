@@ -0,0 +1,111 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .authentication import StatelessJWTAuthentication
+from .middleware import SyncAndAsyncMiddleware
+
+READ_YOUR_WRITES_SECONDS = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 5)
+
+# True while handling a read-only request that may be served by a replica.
+# Everything else, including management commands, reads from the primary.
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary inside the block, even during a replica request.
+    Anything cached for other requests must be built from the primary, or a
+    lagging replica's rows outlive the invalidation that follows a write.
+    """
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads to a random replica when allowed, and writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if replicas and replica_reads.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+def pin_key(user_id):
+    return 'db-pin:%s' % user_id
+
+
+def request_user_id(request):
+    """The user id claimed by the request's access token, or None."""
+    auth = StatelessJWTAuthentication()
+    header = auth.get_header(request)
+    try:
+        raw_token = auth.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        return auth.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+    except AuthenticationFailed:
+        # Malformed or invalid; the view's authentication will answer 401.
+        return None
+
+
+class ReplicaRoutingMiddleware(SyncAndAsyncMiddleware):
+    """
+    Let GET/HEAD/OPTIONS requests read from the replicas, unless the same
+    user made a write in the last READ_YOUR_WRITES_SECONDS, in which case
+    their reads stay on the primary until the replicas have caught up.
+    """
+
+    def call_sync(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', []):
+            return self.get_response(request)
+
+        user_id, safe, use_replica = self.route(request)
+        token = replica_reads.set(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        self.pin(user_id, safe)
+        return response
+
+    async def call_async(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', []):
+            return await self.get_response(request)
+
+        # The cache client blocks, so keep it off the event loop.
+        user_id, safe, use_replica = await sync_to_async(self.route, thread_sensitive=False)(request)
+        token = replica_reads.set(use_replica)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        await sync_to_async(self.pin, thread_sensitive=False)(user_id, safe)
+        return response
+
+    def route(self, request):
+        user_id = request_user_id(request)
+        safe = request.method in SAFE_METHODS
+        use_replica = safe and (user_id is None or cache.get(pin_key(user_id)) is None)
+        return user_id, safe, use_replica
+
+    def pin(self, user_id, safe):
+        if not safe and user_id is not None:
+            cache.set(pin_key(user_id), 1, READ_YOUR_WRITES_SECONDS)
@@ -0,0 +1,116 @@
+"""
+Full-text product search. SQLite keeps an FTS5 table whose rowid is the
+productID, updated from signals and by bulk writers; PostgreSQL uses a GIN
+index over PG_DOCUMENT. Other backends fall back to substring matching.
+"""
+import re
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from .models import Product
+
+FTS_TABLE = 'restapi_product_fts'
+INDEX_BATCH_SIZE = 500
+PG_CONFIG = 'english'
+PG_DOCUMENT = (
+    "to_tsvector('%s', coalesce(restapi_product.product_name, '') || ' ' || "
+    "coalesce(restapi_product.product_description, ''))" % PG_CONFIG
+)
+
+_fts_available = {}
+
+
+def fts_enabled():
+    """Whether the default database has the SQLite FTS5 product index."""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_available:
+        _fts_available[connection.alias] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[connection.alias]
+
+
+def fts_match_expression(text):
+    """
+    Turn free text into an FTS5 query matching every word as a prefix.
+    Each word is quoted so user input can never inject FTS5 operators.
+    """
+    return ' '.join('"%s"*' % word for word in re.findall(r'\w+', text))
+
+
+def search_products(text):
+    """
+    Return a queryset of products matching ``text`` annotated with ``rank``
+    and ordered best match first.
+    """
+    if connection.vendor == 'postgresql':
+        query = "plainto_tsquery('%s', %%s)" % PG_CONFIG
+        return (Product.objects
+                .filter(RawSQL('%s @@ %s' % (PG_DOCUMENT, query), (text,), output_field=BooleanField()))
+                .annotate(rank=RawSQL('ts_rank(%s, %s)' % (PG_DOCUMENT, query), (text,), output_field=FloatField()))
+                .order_by('-rank', 'productID'))
+
+    if fts_enabled():
+        match = fts_match_expression(text)
+        if not match:
+            return Product.objects.none()
+        # bm25() is lower for better matches, so negate it to rank descending.
+        return (Product.objects
+                .filter(productID__in=RawSQL(
+                    'SELECT rowid FROM %s WHERE %s MATCH %%s' % (FTS_TABLE, FTS_TABLE), (match,)))
+                .annotate(rank=RawSQL(
+                    'SELECT -bm25(%s) FROM %s WHERE %s MATCH %%s AND rowid = restapi_product.productID'
+                    % (FTS_TABLE, FTS_TABLE, FTS_TABLE), (match,), output_field=FloatField()))
+                .order_by('-rank', 'productID'))
+
+    return (Product.objects
+            .filter(Q(product_name__icontains=text) | Q(product_description__icontains=text))
+            .annotate(rank=Value(0.0, output_field=FloatField()))
+            .order_by('productID'))
+
+
+def index_products(pks):
+    """(Re)index the products with the given primary keys."""
+    if not fts_enabled() or not pks:
+        return
+    pks = list(pks)
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), INDEX_BATCH_SIZE):
+            batch = pks[start:start + INDEX_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute('DELETE FROM %s WHERE rowid IN (%s)' % (FTS_TABLE, placeholders), batch)
+            cursor.execute(
+                'INSERT INTO %s (rowid, product_name, product_description) '
+                'SELECT productID, product_name, product_description FROM restapi_product '
+                'WHERE productID IN (%s)' % (FTS_TABLE, placeholders), batch)
+
+
+def index_new_products():
+    """
+    Index products inserted without signals, e.g. by bulk_create(), which on
+    SQLite does not report the new primary keys. Product ids only grow, so
+    these are exactly the rows above the highest indexed id.
+    """
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {fts} (rowid, product_name, product_description) '
+            'SELECT productID, product_name, product_description FROM restapi_product '
+            'WHERE productID > (SELECT coalesce(max(rowid), 0) FROM {fts})'.format(fts=FTS_TABLE))
+
+
+def unindex_product(pk):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [pk])
+
+
+def rebuild_index():
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s' % FTS_TABLE)
+        cursor.execute(
+            'INSERT INTO %s (rowid, product_name, product_description) '
+            'SELECT productID, product_name, product_description FROM restapi_product' % FTS_TABLE)
@@ -0,0 +1,218 @@
+"""
+Deterministic synthetic data for load testing and benchmarks.
+
+Rows are generated from a seeded random.Random and written with chunked
+bulk_create using explicit primary keys, so the same seed always produces
+the same database. Popularity follows a Zipf distribution: a few products
+get most of the orders and reviews, and a few customers place most of the
+orders. Character primary keys are numeric strings so the API's
+``<int:pk>`` routes can reach them.
+"""
+import itertools
+import random
+import time
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from djmoney.money import Money
+from .cache import bump_model_version
+from .models import Category, Order, OrderItem, OrderStatus, Product, ProductReview, ShippingAddress, Status
+from .search import rebuild_index
+
+CHUNK_SIZE = 5000
+# Tables seeded with primary keys counting from 1, which must start empty.
+# Categories and users continue from the largest existing key instead.
+NUMBERED_MODELS = (Product, ProductReview, Order, OrderItem, ShippingAddress)
+SEED_CURRENCY = 'KES'
+STATUS_NAMES = ('active', 'draft', 'discontinued')
+ORDER_STATUS_NAMES = ('pending', 'paid', 'shipped', 'delivered', 'cancelled')
+PRODUCT_ZIPF_EXPONENT = 1.1
+CUSTOMER_ZIPF_EXPONENT = 0.8
+# Relative weights of 1..5 stars; reviews skew positive.
+RATING_WEIGHTS = (10, 5, 10, 25, 50)
+QUANTITY_WEIGHTS = (70, 15, 8, 4, 3)
+# Items per order fall off geometrically, from 1 up to MAX_ORDER_ITEMS.
+MAX_ORDER_ITEMS = 20
+CITIES = ('Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Malindi', 'Kitale')
+WORDS = (
+    'leather', 'canvas', 'running', 'trail', 'classic', 'slip-on', 'high-top', 'suede', 'sandal', 'boot',
+    'sneaker', 'loafer', 'waterproof', 'lightweight', 'cushioned', 'vintage', 'court', 'knit', 'chunky', 'mesh',
+)
+
+
+def zipf_cum_weights(n, exponent):
+    """Cumulative weights giving rank k (0-based) a share of 1 / (k + 1) ** exponent."""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def cum_weights(weights):
+    return list(itertools.accumulate(weights))
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def insert(model, objects, chunk_size=CHUNK_SIZE):
+    """bulk_create ``objects``, any iterable, ``chunk_size`` rows at a time."""
+    objects = iter(objects)
+    total = 0
+    while True:
+        chunk = list(itertools.islice(objects, chunk_size))
+        if not chunk:
+            return total
+        model.objects.bulk_create(chunk, batch_size=chunk_size)
+        total += len(chunk)
+
+
+class Seeder:
+    """
+    Fill the database with ``products`` products and the given numbers of
+    users, orders, reviews and addresses. Expects the NUMBERED_MODELS
+    tables to be empty.
+    """
+
+    def __init__(self, seed=1, products=100000, users=20000, orders=200000, reviews=200000, addresses=None,
+                 categories=40, chunk_size=CHUNK_SIZE, log=None):
+        self.rng = random.Random(seed)
+        self.counts = {
+            'categories': categories, 'products': products, 'users': users, 'orders': orders,
+            'reviews': reviews, 'addresses': users if addresses is None else addresses,
+        }
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+
+    def run(self):
+        occupied = [model._meta.db_table for model in NUMBERED_MODELS if model.objects.exists()]
+        if occupied:
+            raise ValueError("Seeding expects empty tables, but these have rows: %s." % ', '.join(occupied))
+        began = time.perf_counter()
+        self.seed_lookups()
+        self.seed_users()
+        self.seed_products()
+        self.seed_orders()
+        self.seed_addresses()
+        self.finish()
+        self.log('Seeded in %.1fs.' % (time.perf_counter() - began))
+        return self.counts
+
+    def step(self, model, objects):
+        began = time.perf_counter()
+        with transaction.atomic():
+            total = insert(model, objects, self.chunk_size)
+        self.log('%d %s rows in %.1fs' % (total, model._meta.model_name, time.perf_counter() - began))
+        return total
+
+    def seed_lookups(self):
+        first = next_id(Category)
+        self.step(Category, (
+            Category(pk=pk, category_name='%s %d' % (self.rng.choice(WORDS).title(), pk))
+            for pk in range(first, first + self.counts['categories'])))
+        self.category_ids = list(range(first, first + self.counts['categories']))
+        self.status_ids = [Status.objects.get_or_create(status_name=name)[0].pk for name in STATUS_NAMES]
+        self.order_status_ids = [
+            OrderStatus.objects.get_or_create(order_status_name=name)[0].pk for name in ORDER_STATUS_NAMES]
+
+    def seed_users(self):
+        # Hashing is deliberately slow, so every seeded user shares one hash.
+        password = make_password('password')
+        first = next_id(User)
+        self.user_ids = list(range(first, first + self.counts['users']))
+        self.step(User, (
+            User(pk=pk, username='user%07d' % pk, email='user%07d@example.com' % pk, password=password)
+            for pk in self.user_ids))
+        self.customer_weights = zipf_cum_weights(len(self.user_ids), CUSTOMER_ZIPF_EXPONENT)
+
+    def seed_products(self):
+        rng = self.rng
+        n = self.counts['products']
+        self.product_ids = list(range(1, n + 1))
+        # Popularity rank -> productID, shuffled so popular products are
+        # spread across the id range.
+        self.by_popularity = self.product_ids[:]
+        rng.shuffle(self.by_popularity)
+        self.product_weights = zipf_cum_weights(n, PRODUCT_ZIPF_EXPONENT)
+
+        # Reviews are drawn up front so the rating summary columns can be
+        # written with the products instead of recomputed afterwards.
+        self.reviews = []
+        summaries = {}
+        rating_weights = cum_weights(RATING_WEIGHTS)
+        reviewed = self.popular_products(self.counts['reviews'])
+        ratings = rng.choices(range(1, 6), cum_weights=rating_weights, k=self.counts['reviews'])
+        for productID, rating in zip(reviewed, ratings):
+            self.reviews.append((productID, rating))
+            summary = summaries.setdefault(productID, [0] * 7)
+            summary[0] += 1
+            summary[1] += rating
+            summary[1 + rating] += 1
+
+        def products():
+            for pk in self.product_ids:
+                price = Decimal(min(max(rng.lognormvariate(7.5, 0.8), 100), 100000)).quantize(Decimal('0.01'))
+                words = rng.sample(WORDS, 3)
+                summary = summaries.get(pk, (0,) * 7)
+                yield Product(
+                    pk=pk, product_name=' '.join(words).title(),
+                    product_description='A %s %s %s shoe, product %d.' % (words[0], words[1], words[2], pk),
+                    product_price=Money(price, SEED_CURRENCY), stock=rng.randint(0, 500),
+                    product_image='images/seed.png', category_id=rng.choice(self.category_ids),
+                    status_id=self.status_ids[0] if rng.random() < 0.9 else rng.choice(self.status_ids),
+                    **dict(zip(Product.RATING_FIELDS, summary)))
+
+        self.step(Product, products())
+        self.step(ProductReview, (
+            ProductReview(reviewID=str(i), product_id=productID, customer_id=self.customer(),
+                          review='Rated %d out of 5.' % rating, rating=rating)
+            for i, (productID, rating) in enumerate(self.reviews, 1)))
+        del self.reviews
+
+    def popular_products(self, k):
+        ranks = self.rng.choices(range(len(self.by_popularity)), cum_weights=self.product_weights, k=k)
+        return [self.by_popularity[rank] for rank in ranks]
+
+    def customer(self):
+        return self.rng.choices(self.user_ids, cum_weights=self.customer_weights)[0]
+
+    def seed_orders(self):
+        rng = self.rng
+        n = self.counts['orders']
+        size_weights = cum_weights([0.5 ** size for size in range(1, MAX_ORDER_ITEMS + 1)])
+        sizes = rng.choices(range(1, MAX_ORDER_ITEMS + 1), cum_weights=size_weights, k=n)
+        quantity_weights = cum_weights(QUANTITY_WEIGHTS)
+        self.step(Order, (
+            Order(orderID=str(pk), customer_id=self.customer(), order_status_id=rng.choice(self.order_status_ids))
+            for pk in range(1, n + 1)))
+
+        def items():
+            orderItemID = 0
+            for orderID, size in enumerate(sizes, 1):
+                for productID in set(self.popular_products(size)):
+                    orderItemID += 1
+                    yield OrderItem(
+                        orderItemID=str(orderItemID), order_id=str(orderID), product_id=productID,
+                        quantity=rng.choices(range(1, 6), cum_weights=quantity_weights)[0])
+
+        self.counts['order_items'] = self.step(OrderItem, items())
+
+    def seed_addresses(self):
+        rng = self.rng
+        self.step(ShippingAddress, (
+            ShippingAddress(
+                addressID=str(pk), customer_id=self.user_ids[(pk - 1) % len(self.user_ids)],
+                address='%d %s Road' % (rng.randint(1, 999), rng.choice(WORDS).title()),
+                city=rng.choice(CITIES), state=rng.choice(CITIES), zipcode='%05d' % rng.randint(100, 99999),
+                phone_number='+2547%08d' % rng.randint(0, 10 ** 8 - 1), country='Kenya')
+            for pk in range(1, self.counts['addresses'] + 1)))
+
+    def finish(self):
+        # Explicit primary keys leave sequences behind on PostgreSQL.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Category, User, Product]):
+                cursor.execute(sql)
+        rebuild_index()
+        for model in (Product, Category, Status, OrderStatus):
+            bump_model_version(model)
@@ -1,10 +1,159 @@
 from rest_framework import serializers
+from django.db import connection, models, transaction
 from .models import *
+from .cache import expire_cached_objects
+from .search import index_products, index_new_products
+from .images import image_storage, schedule_image_variants
+from .lookups import categories, statuses, order_statuses
+from .fieldsets import Expansion, FieldSetMixin, LookupObjectField
 from django.contrib.auth.models import User
-class ProductSerializer(serializers.ModelSerializer):
+
+class LookupRelatedField(serializers.PrimaryKeyRelatedField):
+    """A primary key field resolved through a LookupRegistry, not a query."""
+
+    def __init__(self, registry, **kwargs):
+        self.registry = registry
+        kwargs.setdefault('queryset', registry.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.registry.get(int(data))
+        except self.registry.model.DoesNotExist:
+            # The registry may not have seen a row added in the last
+            # CHECK_INTERVAL, so ask the database before refusing.
+            return super().to_internal_value(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Renders stored image variant names as URLs, absolute when there is a request."""
+
+    def to_representation(self, value):
+        storage = image_storage()
+        request = self.context.get('request')
+        urls = {}
+        for width, names in value.items():
+            urls[width] = {}
+            for extension, name in names.items():
+                url = storage.url(name)
+                urls[width][extension] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+class ProductSerializer(FieldSetMixin, serializers.ModelSerializer):
+    lookup_registries = {Category: categories, Status: statuses}
+    expandable_fields = {
+        'category': Expansion(lambda: LookupObjectField(categories, CategorySerializer, source='category_id')),
+        'status': Expansion(lambda: LookupObjectField(statuses, StatusSerializer, source='status_id')),
+    }
+    extra_fields = ('rating',)
+    field_columns = {
+        'product_price': ('product_price', 'product_price_currency'),
+        'rating': Product.RATING_FIELDS,
+    }
+
     class Meta:
         model = Product
-        fields = '__all__'
+        # Rendered together as the nested "rating" summary instead.
+        exclude = Product.RATING_FIELDS
+
+    def build_relational_field(self, field_name, relation_info):
+        field_class, field_kwargs = super().build_relational_field(field_name, relation_info)
+        registry = self.lookup_registries.get(relation_info.related_model)
+        if registry is not None:
+            return LookupRelatedField, dict(field_kwargs, registry=registry)
+        return field_class, field_kwargs
+
+    def build_standard_field(self, field_name, model_field):
+        if field_name == 'image_variants':
+            return ImageVariantsField, {}
+        return super().build_standard_field(field_name, model_field)
+
+    def save(self, **kwargs):
+        new_image = bool(self.validated_data.get('product_image'))
+        stale_variants = {}
+        if new_image:
+            if self.instance is not None:
+                stale_variants = self.instance.image_variants
+            kwargs.setdefault('image_variants', {})
+        product = super().save(**kwargs)
+        if new_image:
+            schedule_image_variants(product, stale_variants)
+        return product
+
+    def update(self, instance, validated_data):
+        # Stock and the rating counters change through F() updates; saving
+        # the whole row would write back whatever this copy last read.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        fields = set(validated_data)
+        if 'product_price' in fields:
+            fields.add('product_price_currency')
+        instance.save(update_fields=fields)
+        return instance
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if self.includes('rating'):
+            data['rating'] = instance.rating_summary
+        return data
+
+    def compiled_extra_fields(self):
+        if self.includes('rating'):
+            return [('rating', Product.RATING_FIELDS, rating_summary)]
+        return []
+
+def assign_inserted_pks(products):
+    """
+    Fill in the primary keys bulk_create() cannot return on SQLite. SQLite
+    lets one writer in at a time, so the rows this transaction inserted are
+    the newest ones, numbered in order.
+    """
+    last = Product.objects.aggregate(last=models.Max('pk'))['last']
+    for pk, product in enumerate(products, last - len(products) + 1):
+        product.pk = pk
+
+class ProductListSerializer(serializers.ListSerializer):
+    batch_size = 1000
+
+    def create(self, validated_data):
+        products = [Product(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            products = Product.objects.bulk_create(products, batch_size=self.batch_size)
+            if connection.vendor == 'sqlite' and products and products[0].pk is None:
+                assign_inserted_pks(products)
+            index_new_products()
+        expire_cached_objects(Product)
+        return products
+
+    def update(self, instances, validated_data):
+        # Write each product's own fields only: bulk_update() writes every
+        # field it is given to every row, which would put back columns such
+        # as stock from the snapshot the products were loaded in.
+        groups = {}
+        for product, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(product, attr, value)
+            fields = set(attrs)
+            if 'product_price' in fields:
+                fields.add('product_price_currency')
+            if fields:
+                groups.setdefault(frozenset(fields), []).append(product)
+        with transaction.atomic():
+            for fields, products in groups.items():
+                Product.objects.bulk_update(products, fields, batch_size=self.batch_size)
+                if {'product_name', 'product_description'} & fields:
+                    index_products([product.pk for product in products])
+        expire_cached_objects(Product, [product.pk for product in instances])
+        return instances
+
+class ProductBulkSerializer(ProductSerializer):
+    class Meta(ProductSerializer.Meta):
+        list_serializer_class = ProductListSerializer
+        # Images are uploaded one product at a time; catalog syncs are JSON.
+        extra_kwargs = {'product_image': {'required': False}}
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -49,16 +198,89 @@ class UserRegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         return User.objects.create_user(**validated_data)
 
-class OrderSerializer(serializers.ModelSerializer):
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'username')
+
+class OrderSerializer(FieldSetMixin, serializers.ModelSerializer):
+    # Serialize querysets from Order.objects.with_totals() to avoid a
+    # totals query per order.
+    cart_items = serializers.IntegerField(source='total_items', read_only=True)
+    cart_total = serializers.DecimalField(source='total_amount', max_digits=14, decimal_places=2, read_only=True)
+    cart_total_currency = serializers.CharField(source='total_currency', read_only=True)
+
+    expandable_fields = {
+        'customer': Expansion(lambda: UserSummarySerializer(read_only=True), select_related='customer'),
+        'order_status': Expansion(
+            lambda: LookupObjectField(order_statuses, OrderStatusSerializer, source='order_status_id')),
+        'items': Expansion(
+            lambda: OrderItemNestedSerializer(source='orderitem_set', many=True, read_only=True),
+            queryset_method='with_items'),
+    }
+    queryset_methods = {'cart_items': 'with_totals', 'cart_total': 'with_totals', 'cart_total_currency': 'with_totals'}
+
     class Meta:
         model = Order
         fields = '__all__'
 
+    def to_representation(self, instance):
+        if {'cart_items', 'cart_total', 'cart_total_currency'} & set(self.fields):
+            instance.load_totals()
+        return super().to_representation(instance)
+
+    def compiled_extra_fields(self):
+        # Compiled rows must come from with_totals(), which
+        # narrow_queryset() applies when a cart_* field is selected.
+        return []
+
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = '__all__'
 
+class ProductSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ('productID', 'product_name', 'product_price_currency', 'product_price')
+
+class OrderItemNestedSerializer(serializers.ModelSerializer):
+    product = ProductSummarySerializer(read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ('orderItemID', 'product', 'quantity')
+
+class CustomerOrderSerializer(OrderSerializer):
+    order_status = serializers.SerializerMethodField()
+    items = OrderItemNestedSerializer(source='orderitem_set', many=True, read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        fields = ('orderID', 'order_date', 'order_status', 'cart_items', 'cart_total', 'cart_total_currency', 'items')
+
+    def get_order_status(self, obj):
+        return order_statuses.name(obj.order_status_id)
+
+class CheckoutItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+class CheckoutSerializer(serializers.Serializer):
+    items = CheckoutItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        quantities = {}
+        for item in items:
+            quantities[item['product']] = quantities.get(item['product'], 0) + item['quantity']
+        currencies = dict(Product.objects.filter(pk__in=quantities).values_list('pk', 'product_price_currency'))
+        missing = sorted(set(quantities) - set(currencies))
+        if missing:
+            raise serializers.ValidationError('Products %s do not exist.' % ', '.join(map(str, missing)))
+        # Order totals are a single amount in a single currency.
+        if len(set(currencies.values())) > 1:
+            raise serializers.ValidationError('All products in an order must be priced in the same currency.')
+        return quantities
+
 class ShippingAddressSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShippingAddress
@@ -67,4 +289,6 @@ class ShippingAddressSerializer(serializers.ModelSerializer):
 class ProductReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductReview
-        fields = '__all__'
\ No newline at end of file
+        # Only the paginator's ordering key.
+        exclude = ('created',)
+        extra_kwargs = {'rating': {'required': True}}
\ No newline at end of file
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from .authentication import invalidate_user_state
+from .cache import invalidate_cached_object, bump_model_version
+from .models import Product, Category, Status, OrderStatus, ShippingAddress, ProductReview, OrderItem
+from .ratings import apply_rating
+from .search import index_products, unindex_product
+
+CACHED_MODELS = (Product, ShippingAddress, ProductReview, OrderItem)
+VERSIONED_MODELS = (Product, Category, Status, OrderStatus)
+
+
+def invalidate_object_cache(sender, instance, **kwargs):
+    # Until the commit, readers still see the old row and could cache it
+    # again straight after an immediate delete.
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_object(sender, pk))
+
+
+def bump_version(sender, **kwargs):
+    # Wait for the commit so no worker reloads uncommitted rows under the
+    # new version and then keeps them.
+    transaction.on_commit(lambda: bump_model_version(sender))
+
+
+def invalidate_user(sender, instance, **kwargs):
+    # delete() sets the pk to None before the transaction commits.
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_user_state(pk))
+
+
+def remember_review_rating(sender, instance, **kwargs):
+    # A changed review first takes back what it contributed before.
+    instance._rating_before_save = None
+    if not instance._state.adding:
+        instance._rating_before_save = sender.objects.filter(pk=instance.pk).values_list('product_id', 'rating').first()
+
+
+def add_review_rating(sender, instance, **kwargs):
+    if getattr(instance, '_rating_before_save', None):
+        apply_rating(*instance._rating_before_save, -1)
+    apply_rating(instance.product_id, instance.rating, 1)
+
+
+def remove_review_rating(sender, instance, **kwargs):
+    apply_rating(instance.product_id, instance.rating, -1)
+
+
+def index_product(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'product_name', 'product_description'} & set(update_fields):
+        index_products([instance.pk])
+
+
+def unindex_deleted_product(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_object_cache, sender=model)
+    post_delete.connect(invalidate_object_cache, sender=model)
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_version, sender=model)
+    post_delete.connect(bump_version, sender=model)
+
+post_save.connect(invalidate_user, sender=get_user_model())
+post_delete.connect(invalidate_user, sender=get_user_model())
+
+pre_save.connect(remember_review_rating, sender=ProductReview)
+post_save.connect(add_review_rating, sender=ProductReview)
+post_delete.connect(remove_review_rating, sender=ProductReview)
+
+post_save.connect(index_product, sender=Product)
+post_delete.connect(unindex_deleted_product, sender=Product)
@@ -1,3 +1,654 @@
-from django.test import TestCase
+import asyncio
+import io
+import threading
+import time
+from base64 import b64decode
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, RequestFactory, override_settings
+from djmoney.money import Money
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from .cache import cache_aside, invalidate_cached_object, make_json_key
+from .checkout import OutOfStock, place_order
+from .compiled import compile_serializer
+from .localcache import InMemoryBroker, LRUCache, TwoTierCache, local_cache
+from .lookups import categories, order_statuses
+from .metrics import MetricsMiddleware
+from .models import Category, Order, OrderItem, Product, ProductReview, rating_summary
+from .routers import ReplicaRouter, ReplicaRoutingMiddleware, pin_key, replica_reads
+from .search import fts_enabled
+from .seeding import Seeder
+from .serializer import OrderSerializer, ProductBulkSerializer, ProductSerializer
+from .throttling import GCRAUserRateThrottle
 
-# Create your tests here.
+
+class LocalCacheTests(SimpleTestCase):
+
+    def test_invalidation_reaches_every_worker(self):
+        broker = InMemoryBroker()
+        first, second = TwoTierCache(broker), TwoTierCache(broker)
+        for worker in (first, second):
+            worker.get('key')
+            worker.set('key', b'body')
+        first.invalidate(['key'])
+        self.assertIsNone(first.get('key'))
+        self.assertIsNone(second.get('key'))
+
+    def test_invalidation_leaves_other_keys(self):
+        worker = TwoTierCache(InMemoryBroker())
+        worker.set('kept', 1)
+        worker.set('dropped', 2)
+        worker.invalidate(['dropped'])
+        self.assertEqual(worker.get('kept'), 1)
+
+    def test_entries_expire(self):
+        lru = LRUCache(max_entries=10, ttl=0.01)
+        lru.set('key', 1)
+        time.sleep(0.02)
+        self.assertIsNone(lru.get('key'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = LRUCache(max_entries=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+        self.assertEqual(len(lru), 2)
+
+
+class ProductBulkCreateTests(APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('bulkuser', password='password'))
+
+    def test_response_has_the_new_product_ids(self):
+        Product.objects.create(product_name='existing', product_description='', product_price=Money(1, 'KES'))
+        rows = [{'product_name': 'bulk %d' % i, 'product_description': 'bulk', 'product_price': '1.00',
+                 'product_price_currency': 'KES', 'stock': i} for i in range(3)]
+        response = self.client.post('/api/v1/product-bulk-create/', rows, format='json')
+        self.assertEqual(response.status_code, 200)
+        for row, created in zip(rows, response.data):
+            product = Product.objects.get(pk=created['productID'])
+            self.assertEqual((product.product_name, product.stock), (row['product_name'], row['stock']))
+
+
+@skipUnless(connection.vendor == 'sqlite', "the FTS5 index is SQLite's")
+class ProductSearchTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('searchuser', password='password'))
+
+    def product(self, name, description=''):
+        return Product.objects.create(product_name=name, product_description=description,
+                                      product_price=Money(1, 'KES'))
+
+    def search(self, text):
+        response = self.client.get('/api/v1/product-search/', {'q': text})
+        return [product['product_name'] for product in response.data['results']]
+
+    def test_index_follows_saves_renames_and_deletes(self):
+        self.assertTrue(fts_enabled())
+        product = self.product('Suede Boot')
+        self.assertEqual(self.search('suede'), ['Suede Boot'])
+        product.product_name = 'Canvas Sneaker'
+        product.save()
+        self.assertEqual(self.search('suede'), [])
+        self.assertEqual(self.search('canv'), ['Canvas Sneaker'])
+        product.delete()
+        self.assertEqual(self.search('canvas'), [])
+
+    def test_bulk_created_products_are_indexed(self):
+        self.product('Leather Loafer')
+        response = self.client.post('/api/v1/product-bulk-create/', [
+            {'product_name': 'Trail Runner %d' % i, 'product_description': 'trail shoe', 'product_price': '1.00',
+             'product_price_currency': 'KES', 'stock': 1} for i in range(3)], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('trail'), ['Trail Runner 0', 'Trail Runner 1', 'Trail Runner 2'])
+        self.assertEqual(self.search('leather'), ['Leather Loafer'])
+
+    def test_better_matches_rank_first(self):
+        self.product('Knit Sandal', 'A sandal with a knit strap, among many other fine details of the design.')
+        self.product('Knit Sneaker', 'A knit sneaker, knit throughout.')
+        self.product('Mesh Sneaker', 'Nothing woven here.')
+        self.assertEqual(self.search('knit'), ['Knit Sneaker', 'Knit Sandal'])
+
+
+class LookupRelatedFieldTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_accepts_a_row_the_registry_has_not_seen_yet(self):
+        categories.all()
+        category = Category.objects.create(category_name='new')
+        product = Product.objects.create(product_name='product', product_description='', product_price=Money(1, 'KES'))
+        serializer = ProductSerializer(product, data={'category': category.pk}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['category'], category)
+
+    def test_rejects_a_missing_row(self):
+        product = Product.objects.create(product_name='product', product_description='', product_price=Money(1, 'KES'))
+        serializer = ProductSerializer(product, data={'category': 999}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['category'][0].code, 'does_not_exist')
+
+
+class ProductBulkUpdateTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_only_write_their_own_fields(self):
+        first, second = [Product.objects.create(product_name='product', product_description='', stock=10,
+                                                product_price=Money(1, 'KES')) for _ in range(2)]
+        instances = list(Product.objects.filter(pk__in=[first.pk, second.pk]).order_by('pk'))
+        # A checkout lands after the products were loaded.
+        Product.objects.filter(pk=second.pk).update(stock=F('stock') - 3)
+        serializer = ProductBulkSerializer(
+            instance=instances, data=[{'stock': 20}, {'product_name': 'renamed'}], many=True, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('product_name', 'stock')),
+                         [('product', 20), ('renamed', 7)])
+
+
+class CheckoutTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('checkoutuser', password='password'))
+
+    def product(self, stock=10, currency='KES', price=5):
+        return Product.objects.create(product_name='product', product_description='', stock=stock,
+                                      product_price=Money(price, currency))
+
+    def test_checkout_reserves_stock_and_totals_the_order(self):
+        first, second = self.product(price=5), self.product(price=2)
+        response = self.client.post('/api/v1/checkout/', {'items': [
+            {'product': first.pk, 'quantity': 2}, {'product': second.pk, 'quantity': 3}]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['cart_items'], response.data['cart_total']), (5, '16.00'))
+        self.assertEqual(response.data['cart_total_currency'], 'KES')
+        self.assertEqual([p.stock for p in Product.objects.order_by('pk')], [8, 7])
+
+    def test_insufficient_stock_is_a_conflict(self):
+        product = self.product(stock=1)
+        response = self.client.post('/api/v1/checkout/', {'items': [{'product': product.pk, 'quantity': 2}]},
+                                    format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['products'], [product.pk])
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 1)
+
+    def test_unknown_products_are_rejected(self):
+        product = self.product()
+        response = self.client.post('/api/v1/checkout/', {'items': [
+            {'product': product.pk, 'quantity': 1}, {'product': 999999, 'quantity': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', str(response.data['items']))
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 10)
+
+    def test_mixed_currencies_are_rejected(self):
+        shillings, dollars = self.product(currency='KES'), self.product(currency='USD')
+        response = self.client.post('/api/v1/checkout/', {'items': [
+            {'product': shillings.pk, 'quantity': 1}, {'product': dollars.pk, 'quantity': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+        self.assertFalse(Order.objects.exists())
+
+
+
+
+class OrderTotalsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('totalsuser', password='password')
+        self.client.force_authenticate(self.user)
+        kes = Product.objects.create(product_name='kes', product_description='', product_price=Money(100, 'KES'))
+        usd = Product.objects.create(product_name='usd', product_description='', product_price=Money(1, 'USD'))
+        for orderID, items in (('mixed', [(kes, 1), (usd, 1)]), ('single', [(kes, 2)]), ('empty', [])):
+            Order.objects.create(orderID=orderID, customer=self.user)
+            for i, (product, quantity) in enumerate(items):
+                OrderItem.objects.create(orderItemID='%s-%d' % (orderID, i), order_id=orderID, product=product,
+                                         quantity=quantity)
+        self.expected = {'mixed': (2, None, None), 'single': (2, '200.00', 'KES'), 'empty': (0, '0.00', None)}
+
+    def totals(self, path):
+        results = self.client.get(path).data['results']
+        return {order['orderID']: (order['cart_items'], order['cart_total'], order['cart_total_currency'])
+                for order in results}
+
+    def test_mixed_currencies_have_no_total(self):
+        self.assertEqual(self.totals('/api/v1/my-orders/'), self.expected)
+        self.assertEqual(self.totals('/api/v1/order-list/'), self.expected)
+
+    def test_cart_total_of_a_single_order(self):
+        self.assertIsNone(Order.objects.get(pk='mixed').cart_total)
+        self.assertEqual(Order.objects.get(pk='single').cart_total, Money(200, 'KES'))
+
+
+class CustomerOrderListTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ordersuser', password='password')
+        self.other = User.objects.create_user('otheruser', password='password')
+        self.client.force_authenticate(self.user)
+        self.products = [Product.objects.create(product_name='product %d' % i, product_description='',
+                                                product_price=Money(2, 'KES')) for i in range(10)]
+        # Load the order statuses now so only the listing's own queries are counted.
+        order_statuses.all()
+
+    def order(self, orderID, customer, items):
+        Order.objects.create(orderID=orderID, customer=customer)
+        for product in self.products[:items]:
+            OrderItem.objects.create(orderItemID='%s-%d' % (orderID, product.pk), order_id=orderID,
+                                     product=product, quantity=1)
+
+    def test_query_count_does_not_grow_with_items(self):
+        self.order('small', self.user, 1)
+        with self.assertNumQueries(2):
+            small = self.client.get('/api/v1/my-orders/')
+        self.order('large', self.user, 10)
+        with self.assertNumQueries(2):
+            both = self.client.get('/api/v1/my-orders/')
+        self.assertEqual(len(small.data['results'][0]['items']), 1)
+        self.assertEqual({order['orderID']: len(order['items']) for order in both.data['results']},
+                         {'small': 1, 'large': 10})
+
+    def test_only_the_requesting_users_orders_are_listed(self):
+        self.order('mine', self.user, 1)
+        self.order('theirs', self.other, 1)
+        response = self.client.get('/api/v1/my-orders/')
+        self.assertEqual([order['orderID'] for order in response.data['results']], ['mine'])
+
+
+class ProductUpdateTests(APITestCase):
+
+    def test_update_keeps_counters_changed_since_the_product_was_read(self):
+        product = Product.objects.create(product_name='before', product_description='', stock=10,
+                                         product_price=Money(1, 'KES'), product_image='images/x.png')
+        Product.objects.filter(pk=product.pk).update(stock=F('stock') - 4, rating_count=1, rating_sum=5, rating_5=1)
+        serializer = ProductSerializer(instance=product, data={
+            'product_name': 'after', 'product_description': 'changed', 'product_price': '2.00',
+            'product_price_currency': 'KES'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        product.refresh_from_db()
+        self.assertEqual((product.product_name, product.product_price), ('after', Money(2, 'KES')))
+        self.assertEqual((product.stock, product.rating_count, product.rating_5), (6, 1, 1))
+
+class ProductReviewTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reviewuser', password='password')
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(product_name='product', product_description='',
+                                              product_price=Money(1, 'KES'))
+
+    def rating(self):
+        return self.client.get('/api/v1/product-reviews/%d/' % self.product.pk).data['rating']
+
+    def create(self, reviewID, rating):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/review-create/', {
+                'reviewID': reviewID, 'product': self.product.pk, 'customer': self.user.pk,
+                'review': 'review', 'rating': rating})
+
+    def test_rating_summary_follows_review_changes(self):
+        self.create('1', 5)
+        self.create('2', 3)
+        self.assertEqual(self.rating(), rating_summary(2, 8, 0, 0, 1, 0, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            review = ProductReview.objects.get(pk='2')
+            review.rating = 4
+            review.save()
+        self.assertEqual(self.rating(), rating_summary(2, 9, 0, 0, 0, 1, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete('/api/v1/review-delete/1/')
+        self.assertEqual(self.rating(), rating_summary(1, 4, 0, 0, 0, 1, 0))
+
+    def test_recompute_ratings_rebuilds_the_summary(self):
+        self.create('1', 5)
+        self.create('2', 2)
+        Product.objects.update(rating_count=0, rating_sum=0, rating_5=7)
+        call_command('recompute_ratings', stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(pk=self.product.pk).rating_summary, rating_summary(2, 7, 0, 1, 0, 0, 1))
+
+    def test_reviews_of_one_day_page_by_creation(self):
+        for i in range(5):
+            self.create('r%d' % i, 5)
+        reviewIDs, path = [], '/api/v1/product-reviews/%d/?page_size=2' % self.product.pk
+        while path:
+            response = self.client.get(path)
+            reviewIDs += [review['reviewID'] for review in response.data['results']]
+            path = response.data['next']
+            if path:
+                # Each cursor is a position alone, with no offset past ties.
+                cursor = parse_qs(urlparse(path).query)['cursor'][0]
+                self.assertNotIn('o', parse_qs(b64decode(cursor).decode()))
+        self.assertEqual(reviewIDs, ['r4', 'r3', 'r2', 'r1', 'r0'])
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    threads = 8
+    attempts = 25
+
+    def test_concurrent_checkouts_never_oversell(self):
+        stock = self.threads * self.attempts // 2
+        product = Product.objects.create(product_name='contended', product_description='',
+                                         product_price=Money(1, 'KES'), stock=stock)
+        outcomes = []
+        lock = threading.Lock()
+        start = threading.Barrier(self.threads)
+
+        def worker():
+            results = []
+            start.wait()
+            try:
+                for _ in range(self.attempts):
+                    try:
+                        place_order(None, {product.pk: 1})
+                        results.append('placed')
+                    except OutOfStock:
+                        results.append('out_of_stock')
+                    except Exception as exc:
+                        results.append(repr(exc))
+            finally:
+                connection.close()
+            with lock:
+                outcomes.extend(results)
+
+        threads = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        errors = [outcome for outcome in outcomes if outcome not in ('placed', 'out_of_stock')]
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(outcomes.count('placed'), stock)
+        self.assertEqual((sold, product.stock), (stock, 0))
+
+class CompiledSerializerTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(category_name='boots')
+        Product.objects.create(
+            product_name='with image', product_description='', product_price=Money('12.50', 'KES'),
+            category=category, product_image='images/boot.png',
+            image_variants={'160': {'jpg': 'images/variants/boot_160.jpg'}}, rating_count=2, rating_sum=9, rating_4=1, rating_5=1)
+        bare = Product.objects.create(product_name='bare', product_description='', product_price=Money(3, 'USD'))
+        Order.objects.create(orderID='empty')
+        Order.objects.create(orderID='full')
+        OrderItem.objects.create(orderItemID='1', order_id='full', product=bare, quantity=2)
+        OrderItem.objects.create(orderItemID='2', order_id='full', product=bare, quantity=1)
+        self.request = RequestFactory().get('/')
+
+    def assertCompiledMatches(self, serializer_class, queryset, **kwargs):
+        compiled = compile_serializer(serializer_class, **kwargs)
+        self.assertIsNotNone(compiled)
+        fieldset = {name: kwargs[name] for name in ('fields', 'expand') if name in kwargs}
+        queryset = serializer_class.narrow_queryset(queryset, **fieldset)
+        renderer = JSONRenderer()
+        expected = renderer.render(serializer_class(list(queryset), many=True, **kwargs).data)
+        self.assertEqual(renderer.render(compiled.serialize(compiled.values(queryset))), expected)
+
+    def test_products(self):
+        products = Product.objects.order_by('pk')
+        self.assertCompiledMatches(ProductSerializer, products)
+        self.assertCompiledMatches(ProductSerializer, products, context={'request': self.request})
+        self.assertCompiledMatches(ProductSerializer, products, fields=['product_name', 'product_price', 'rating'])
+        self.assertCompiledMatches(ProductSerializer, products, expand=['category'])
+        self.assertCompiledMatches(ProductSerializer, products, fields=['product_name'], expand=['category'])
+
+    def test_orders(self):
+        orders = Order.objects.order_by('orderID')
+        self.assertCompiledMatches(OrderSerializer, orders)
+        self.assertCompiledMatches(OrderSerializer, orders, fields=['orderID', 'cart_items', 'cart_total'])
+        self.assertCompiledMatches(OrderSerializer, orders, fields=['cart_total_currency'])
+
+
+class ProductListTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('listuser', password='password'))
+        self.products = [
+            Product.objects.create(product_name='product %d' % i, product_description='description',
+                                   product_price=Money(i + 1, 'KES'), stock=i)
+            for i in range(5)]
+
+    def test_malformed_filters_are_bad_requests(self):
+        for query in ('category=abc', 'category=²', 'status=1.5', 'min_price=cheap'):
+            response = self.client.get('/api/v1/product-list/?' + query)
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_cursor_pagination_visits_every_product_once(self):
+        seen = []
+        url = '/api/v1/product-list/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [product['productID'] for product in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, [product.pk for product in self.products])
+
+    def test_etag_answers_not_modified_until_a_product_changes(self):
+        etag = self.client.get('/api/v1/product-list/')['ETag']
+        self.assertEqual(self.client.get('/api/v1/product-list/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+        self.assertEqual(self.client.get('/api/v1/product-list/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_fields_and_expand(self):
+        response = self.client.get('/api/v1/product-list/?fields=productID,product_price&expand=category')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['results'][0]), ['productID', 'product_price', 'category'])
+        response = self.client.get('/api/v1/product-list/?fields=secret&expand=owner')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'fields', 'expand'})
+
+
+class MetricsMiddlewareTests(TransactionTestCase):
+
+    def test_middleware_stays_async_under_asgi(self):
+        async def get_response(request):
+            return HttpResponse()
+        for middleware in (MetricsMiddleware, ReplicaRoutingMiddleware):
+            self.assertTrue(asyncio.iscoroutinefunction(middleware(get_response)), middleware)
+
+    def test_queries_in_the_async_thread_pool_are_counted(self):
+        cache.clear()
+        user = User.objects.create_user('asyncuser', password='password')
+        product = Product.objects.create(product_name='async', product_description='', product_price=Money(1, 'KES'))
+        labels = {'route': 'api/v1/async/product-detail/<int:pk>/', 'method': 'GET'}
+        before = REGISTRY.get_sample_value('api_request_db_queries_sum', labels) or 0
+        response = async_to_sync(AsyncClient().get)(
+            '/api/v1/async/product-detail/%d/' % product.pk, authorization='Bearer %s' % AccessToken.for_user(user))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(REGISTRY.get_sample_value('api_request_db_queries_sum', labels) - before, 1)
+
+
+class GCRAThrottleTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        GCRAUserRateThrottle._local_tokens.clear()
+        self.now = 1000.0
+        self.request = SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=1))
+
+    def throttle(self, rate, local_batch=1):
+        throttle_class = type('Throttle', (GCRAUserRateThrottle,), {'rate': rate, 'local_batch': local_batch})
+        throttle = throttle_class()
+        throttle.timer = lambda: self.now
+        return throttle
+
+    def granted(self, throttle, attempts):
+        return sum(throttle.allow_request(self.request, None) for _ in range(attempts))
+
+    def test_burst_is_the_rate_and_then_one_per_interval(self):
+        throttle = self.throttle('10/min')
+        self.assertEqual(self.granted(throttle, 12), 10)
+        self.assertAlmostEqual(throttle.wait(), 6.0)
+        self.now += 5.9
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertAlmostEqual(throttle.wait(), 0.1)
+        self.now += 0.1
+        self.assertTrue(throttle.allow_request(self.request, None))
+        self.assertIsNone(throttle.wait())
+
+    def test_local_batches_are_charged_up_front(self):
+        throttle = self.throttle('100/min', local_batch=5)
+        self.assertTrue(throttle.allow_request(self.request, None))
+        # The whole batch of five is charged, at 600ms each.
+        self.assertEqual(cache.get(throttle.key), (self.now + 5 * 0.6) * 1000)
+        self.assertEqual(self.granted(throttle, 120), 99)
+        self.assertFalse(throttle.allow_request(self.request, None))
+
+
+class CacheAsideTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        local_cache.lru.clear()
+
+    def test_refill_racing_an_invalidation_is_not_stored(self):
+        key = make_json_key(Product, 1)
+
+        def compute():
+            # A write commits, and invalidates, while the old row renders.
+            invalidate_cached_object(Product, 1)
+            return b'old'
+        self.assertEqual(cache_aside(key, compute, Product, local=True), b'old')
+        self.assertIsNone(cache.get(key))
+        self.assertIsNone(local_cache.get(key))
+        self.assertEqual(cache_aside(key, lambda: b'new', Product, local=True), b'new')
+        self.assertEqual(cache.get(key)[0], b'new')
+        self.assertEqual(local_cache.get(key), b'new')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cache_refills_read_from_the_primary(self):
+        router = ReplicaRouter()
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Product), 'replica')
+            self.assertEqual(cache_aside('refill', lambda: router.db_for_read(Product), Product), 'default')
+            self.assertEqual(router.db_for_read(Product), 'replica')
+        finally:
+            replica_reads.reset(token)
+
+    def routed(self, method, user_id=7):
+        """The database ReplicaRouter picks for reads while handling a request."""
+        used = []
+
+        def get_response(request):
+            used.append(ReplicaRouter().db_for_read(Product))
+            return HttpResponse()
+        token = AccessToken.for_user(User(pk=user_id))
+        request = getattr(RequestFactory(), method)('/', HTTP_AUTHORIZATION='Bearer %s' % token)
+        ReplicaRoutingMiddleware(get_response)(request)
+        return used[0]
+
+    def test_reads_use_a_replica(self):
+        self.assertEqual(self.routed('get'), 'replica')
+
+    def test_a_write_pins_the_user_to_the_primary(self):
+        self.assertEqual(self.routed('post'), 'default')
+        self.assertIsNotNone(cache.get(pin_key(7)))
+        self.assertEqual(self.routed('get'), 'default')
+        self.assertEqual(self.routed('get', user_id=8), 'replica')
+
+    def test_malformed_authorization_is_unauthorized(self):
+        response = self.client.get('/api/v1/my-orders/', HTTP_AUTHORIZATION='Bearer a b')
+        self.assertEqual(response.status_code, 401)
+
+
+class StatelessJWTAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('tokenuser', password='password')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.user))
+        # Warm the cached user state the revocation has to clear.
+        self.assertEqual(self.client.get('/api/v1/my-orders/').status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/api/v1/my-orders/').status_code, 401)
+
+    def test_user_deleted_inside_a_transaction_is_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.user.delete()
+        self.assertEqual(self.client.get('/api/v1/my-orders/').status_code, 401)
+
+
+class ProductExportTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('exportuser', password='password'))
+        Product.objects.create(product_name='exported', product_description='', product_price=Money(1, 'KES'))
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_streamed_rows_are_routed_and_recorded(self):
+        labels = {'route': 'api/v1/product-export/<str:export_format>/', 'method': 'GET'}
+        before = REGISTRY.get_sample_value('api_request_db_queries_sum', labels) or 0
+        routed = []
+
+        def db_for_read(router, model, **hints):
+            routed.append(replica_reads.get())
+            return 'default'
+        with mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read):
+            response = self.client.get('/api/v1/product-export/ndjson/')
+            body = b''.join(response.streaming_content)
+        self.assertIn(b'"product_name":"exported"', body)
+        self.assertEqual(set(routed), {True})
+        self.assertGreaterEqual(REGISTRY.get_sample_value('api_request_db_queries_sum', labels) - before, 1)
+
+
+class SeedingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seeds_an_empty_database(self):
+        counts = Seeder(products=5, users=2, orders=3, reviews=4, categories=2).run()
+        self.assertEqual(counts['products'], Product.objects.count())
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_refuses_tables_it_would_collide_with(self):
+        Order.objects.create(orderID='1')
+        with self.assertRaises(ValueError):
+            Seeder(products=5, users=2, orders=3, reviews=4, categories=2).run()
+        self.assertFalse(Product.objects.exists())
@@ -0,0 +1,110 @@
+import math
+import threading
+from django.conf import settings
+from rest_framework.throttling import UserRateThrottle
+
+# Generic cell rate algorithm. The only state per client is its theoretical
+# arrival time (TAT) in milliseconds: each request pushes it forward by one
+# emission interval, and a request is refused while the TAT would sit more
+# than a full period ahead of now. Time comes from the Redis server so every
+# worker shares one clock.
+GCRA_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local emission = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission * cost
+local retry = new_tat - period - now
+if retry > 0 then
+    return math.ceil(retry)
+end
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return 0
+"""
+
+# Requests a worker reserves from Redis in one round trip and then grants
+# locally. 1 disables the local bucket.
+LOCAL_BATCH = getattr(settings, 'THROTTLE_LOCAL_BATCH', 1)
+
+
+class GCRAUserRateThrottle(UserRateThrottle):
+    """
+    Drop-in replacement for UserRateThrottle that stores a single timestamp
+    per client instead of the full request history, and checks and updates
+    it with one atomic Redis script.
+
+    With THROTTLE_LOCAL_BATCH above 1 each worker reserves that many
+    requests at a time and grants them from memory, so most requests make
+    no round trip at all. Reserved requests count against the client even
+    if the worker never uses them.
+    """
+
+    cache_format = 'gcra_%(scope)s_%(ident)s'
+    local_batch = LOCAL_BATCH
+
+    _script = None
+    _local_lock = threading.Lock()
+    _local_tokens = {}
+    _fallback_lock = threading.Lock()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        batch = min(self.local_batch, max(self.num_requests // 10, 1))
+        if batch > 1:
+            with self._local_lock:
+                tokens = self._local_tokens.pop(self.key, 0)
+                if tokens > 1:
+                    self._local_tokens[self.key] = tokens - 1
+                if tokens:
+                    return True
+            if self.reserve(batch):
+                with self._local_lock:
+                    self._local_tokens[self.key] = self._local_tokens.get(self.key, 0) + batch - 1
+                return True
+        return self.reserve(1)
+
+    def reserve(self, cost):
+        """
+        Charge ``cost`` requests to the client. Returns False, recording how
+        long to wait, if that would exceed the rate.
+        """
+        emission = self.duration * 1000.0 / self.num_requests
+        period = self.duration * 1000
+        if settings.CACHES['default']['BACKEND'] == 'django_redis.cache.RedisCache':
+            retry = self.redis_script()(keys=[self.cache.make_key(self.key)], args=[emission, period, cost])
+        else:
+            retry = self.reserve_locally(emission, period, cost)
+        self.retry_after = float(retry) / 1000
+        return self.retry_after <= 0
+
+    def reserve_locally(self, emission, period, cost):
+        # Same algorithm for caches without scripting (locmem in development).
+        with self._fallback_lock:
+            now = self.timer() * 1000
+            tat = max(self.cache.get(self.key) or now, now)
+            new_tat = tat + emission * cost
+            retry = new_tat - period - now
+            if retry > 0:
+                return retry
+            self.cache.set(self.key, new_tat, math.ceil((new_tat - now) / 1000))
+            return 0
+
+    @classmethod
+    def redis_script(cls):
+        if cls._script is None:
+            from django_redis import get_redis_connection
+            GCRAUserRateThrottle._script = get_redis_connection('default').register_script(GCRA_SCRIPT)
+        return cls._script
+
+    def wait(self):
+        return max(getattr(self, 'retry_after', 0), 0) or None
@@ -1,22 +1,29 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
 	path('user-register/', views.UserRegisterView.as_view(), name='user-register'),
 
 	path('product-list/', views.ProductListView.as_view(), name="product-list"),
+	path('product-search/', views.ProductSearchView.as_view(), name="product-search"),
+	path('product-export/<str:export_format>/', views.ProductExportView.as_view(), name="product-export"),
 	path('product-detail/<int:pk>/', views.ProductDetailView.as_view(), name="product-detail"),
 	path('product-create/', views.ProductCreateView.as_view(), name="product-create"),
 	path('product-update/<int:pk>/', views.ProductUpdateView.as_view(), name="product-update"),
 	path('product-delete/<int:pk>/', views.ProductDeleteView.as_view(), name="product-delete"),
+	path('product-bulk-create/', views.ProductBulkCreateView.as_view(), name="product-bulk-create"),
+	path('product-bulk-update/', views.ProductBulkUpdateView.as_view(), name="product-bulk-update"),
 
+	path('product-reviews/<int:pk>/', views.ProductReviewListView.as_view(), name="product-reviews"),
 	path('review-detail/<int:pk>/', views.ReviewDetailView.as_view(), name="review-detail"),
 	path('review-create/', views.ReviewCreateView.as_view(), name="review-create"),
 	path('review-delete/<int:pk>/', views.ReviewDeleteView.as_view(), name="review-delete"),
 
 	path('category-list/', views.CategoryListView.as_view(), name="category-list"),
 	path('order-list/', views.OrderListView.as_view(), name="order-list"),
+	path('my-orders/', views.CustomerOrderListView.as_view(), name="my-orders"),
+	path('checkout/', views.CheckoutView.as_view(), name="checkout"),
 	path('order-detail/<int:pk>/', views.OrderDetailView.as_view(), name="order-detail"),
 
 	path('address-detail/<int:pk>/', views.AddressDetailView.as_view(), name="address-detail"),
@@ -24,6 +31,10 @@ urlpatterns = [
 	path('address-update/<int:pk>/', views.AddressUpdateView.as_view(), name="address-update"),
 	path('address-delete/<int:pk>/', views.AddressDeleteView.as_view(), name="address-delete"),
 
+	path('async/product-list/', async_views.product_list, name="async-product-list"),
+	path('async/product-detail/<int:pk>/', async_views.product_detail, name="async-product-detail"),
+	path('async/category-list/', async_views.category_list, name="async-category-list"),
+
 	path('token/', TokenObtainPairView.as_view(), name="token"),
 	path('token/refresh/', TokenRefreshView.as_view(), name="token-refresh"),
 ]
\ No newline at end of file
@@ -1,3 +1,6 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework.response import Response
 from .serializer import *
 from .models import *
@@ -5,8 +8,17 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.core.cache import cache
-from rest_framework.throttling import UserRateThrottle
+from .throttling import GCRAUserRateThrottle
+from .pagination import ProductCursorPagination, OrderCursorPagination, ReviewCursorPagination, SearchPagination
+from .cache import get_cached_object, get_cached_json, model_etag
+from .export import EXPORT_FORMATS, PRODUCT_EXPORT_FIELDS
+from .search import search_products
+from .filters import TRUE_VALUES, filter_products, product_facets
+from .fieldsets import ordering_columns, parse_fieldsets
+from .compiled import compile_serializer
+from .lookups import categories
+from .checkout import OutOfStock, place_order
+from .middleware import stream_in_context
 
 
 class UserRegisterView(APIView):
@@ -40,35 +52,173 @@ class UserRegisterView(APIView):
 
 class ProductListView(APIView):
     
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     access_token_param_config = openapi.Parameter('Authorization',
                                                   openapi.IN_HEADER,
                                                   description="access token",
                                                   type=openapi.TYPE_STRING)
+    cursor_param_config = openapi.Parameter('cursor',
+                                            openapi.IN_QUERY,
+                                            description="pagination cursor",
+                                            type=openapi.TYPE_STRING)
+    page_size_param_config = openapi.Parameter('page_size',
+                                               openapi.IN_QUERY,
+                                               description="number of results per page",
+                                               type=openapi.TYPE_INTEGER)
+    fields_param_config = openapi.Parameter('fields',
+                                            openapi.IN_QUERY,
+                                            description="comma-separated fields to include",
+                                            type=openapi.TYPE_STRING)
+    expand_param_config = openapi.Parameter('expand',
+                                            openapi.IN_QUERY,
+                                            description="comma-separated related fields to inline: category, status",
+                                            type=openapi.TYPE_STRING)
+    filter_param_configs = [
+        openapi.Parameter('category', openapi.IN_QUERY, description="category ID", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('status', openapi.IN_QUERY, description="status ID", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('currency', openapi.IN_QUERY, description="price currency code", type=openapi.TYPE_STRING),
+        openapi.Parameter('min_price', openapi.IN_QUERY, description="lowest price", type=openapi.TYPE_NUMBER),
+        openapi.Parameter('max_price', openapi.IN_QUERY, description="highest price", type=openapi.TYPE_NUMBER),
+        openapi.Parameter('in_stock', openapi.IN_QUERY, description="only products in stock", type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter('facets', openapi.IN_QUERY, description="include counts per category and status", type=openapi.TYPE_BOOLEAN),
+    ]
 
     @swagger_auto_schema(
-        manual_parameters=[access_token_param_config],
+        manual_parameters=[access_token_param_config, cursor_param_config, page_size_param_config,
+                           fields_param_config, expand_param_config] + filter_param_configs,
         operation_description="""
-        This endpoint is used to retrieve a list of available products.
+        This endpoint is used to retrieve a paginated list of available products,
+        optionally filtered and with facet counts for the filtered set.
         """,
         responses={
             200: openapi.Response('Success', None),
+            304: openapi.Response('Not Modified', None),
             400: openapi.Response('Bad Request', None),
             404: openapi.Response('Not Found', None),
             500: openapi.Response('Internal Server Error', None),
         })
+    @method_decorator(condition(etag_func=model_etag(Product, Category, Status)))
+    def get(self, request):
+        queryset, errors = filter_products(Product.objects.all(), request.query_params)
+        fieldset, fieldset_errors = parse_fieldsets(request.query_params, ProductSerializer)
+        errors.update(fieldset_errors)
+        if errors:
+            return Response(errors, status=400)
+        paginator = ProductCursorPagination()
+        keep = ordering_columns(paginator.ordering)
+        narrowed = ProductSerializer.narrow_queryset(queryset, keep=keep, **fieldset)
+        compiled = compile_serializer(ProductSerializer, **fieldset)
+        if compiled is not None:
+            narrowed = compiled.values(narrowed, keep=keep)
+        products = paginator.paginate_queryset(narrowed, request, view=self)
+        if compiled is not None:
+            data = compiled.serialize(products)
+        else:
+            data = ProductSerializer(products, many=True, **fieldset).data
+        response = paginator.get_paginated_response(data)
+        if request.query_params.get('facets', '').lower() in TRUE_VALUES:
+            response.data['facets'] = product_facets(queryset)
+        return response
+
+
+class ProductExportView(APIView):
+
+    throttle_classes = [GCRAUserRateThrottle]
+    permission_classes = (IsAuthenticated, )
+    chunk_size = 2000
+
+    format_param_config = openapi.Parameter('export_format',
+                                            openapi.IN_PATH,
+                                            description="ndjson or csv",
+                                            type=openapi.TYPE_STRING)
+    access_token_param_config = openapi.Parameter('Authorization',
+                                                  openapi.IN_HEADER,
+                                                  description="access token",
+                                                  type=openapi.TYPE_STRING)
+
+    @swagger_auto_schema(
+        manual_parameters=[format_param_config, access_token_param_config],
+        operation_description="""
+        This endpoint is used to stream the full product catalog as
+        newline-delimited JSON or CSV.
+        """,
+        responses={
+            200: openapi.Response('Success', None),
+            404: openapi.Response('Not Found', None),
+            500: openapi.Response('Internal Server Error', None),
+        })
+    def get(self, request, export_format):
+        if export_format not in EXPORT_FORMATS:
+            return Response(status=404)
+        iter_rows, content_type = EXPORT_FORMATS[export_format]
+        rows = Product.objects.order_by('productID').values_list(
+            *PRODUCT_EXPORT_FIELDS).iterator(chunk_size=self.chunk_size)
+        # The rows are only read as the body streams, after the middleware
+        # has returned.
+        response = StreamingHttpResponse(
+            stream_in_context(iter_rows(PRODUCT_EXPORT_FIELDS, rows, self.chunk_size)), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="products.%s"' % export_format
+        return response
+
+
+class ProductSearchView(APIView):
+
+    throttle_classes = [GCRAUserRateThrottle]
+    permission_classes = (IsAuthenticated, )
+
+    query_param_config = openapi.Parameter('q',
+                                           openapi.IN_QUERY,
+                                           description="search text",
+                                           type=openapi.TYPE_STRING)
+    page_param_config = openapi.Parameter('page',
+                                          openapi.IN_QUERY,
+                                          description="page number",
+                                          type=openapi.TYPE_INTEGER)
+    fields_param_config = openapi.Parameter('fields',
+                                            openapi.IN_QUERY,
+                                            description="comma-separated fields to include",
+                                            type=openapi.TYPE_STRING)
+    expand_param_config = openapi.Parameter('expand',
+                                            openapi.IN_QUERY,
+                                            description="comma-separated related fields to inline: category, status",
+                                            type=openapi.TYPE_STRING)
+    access_token_param_config = openapi.Parameter('Authorization',
+                                                  openapi.IN_HEADER,
+                                                  description="access token",
+                                                  type=openapi.TYPE_STRING)
 
+    @swagger_auto_schema(
+        manual_parameters=[query_param_config, page_param_config, fields_param_config, expand_param_config,
+                           access_token_param_config],
+        operation_description="""
+        This endpoint is used to search products by name and description,
+        best matches first.
+        """,
+        responses={
+            200: openapi.Response('Success', None),
+            400: openapi.Response('Bad Request', None),
+            404: openapi.Response('Not Found', None),
+            500: openapi.Response('Internal Server Error', None),
+        })
     def get(self, request):
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'q': ['This query parameter is required.']}, status=400)
+        fieldset, errors = parse_fieldsets(request.query_params, ProductSerializer)
+        if errors:
+            return Response(errors, status=400)
+        paginator = SearchPagination()
+        queryset = ProductSerializer.narrow_queryset(search_products(text), keep=('productID',), **fieldset)
+        products = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ProductSerializer(products, many=True, **fieldset)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ProductDetailView(APIView):
     
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     id_param_config = openapi.Parameter('id',
@@ -87,30 +237,23 @@ class ProductDetailView(APIView):
         """,
         responses={
             200: openapi.Response('Success', ProductSerializer),
+            304: openapi.Response('Not Modified', None),
             400: openapi.Response('Bad Request', None),
             404: openapi.Response('Not Found', None),
             500: openapi.Response('Internal Server Error', None),
         })
-
+    @method_decorator(condition(etag_func=model_etag(Product)))
     def get(self, request, *args, **kwargs):
-        productID = kwargs['pk']
-        if cache.get(productID):
-            product = cache.get(productID)
-            print("Cache hit")
-        else: 
-            try:
-                product = Product.objects.get(pk=productID)
-                cache.set(productID, product)
-                print("Cache miss")
-            except Product.DoesNotExist:
-                return Response(status=404)
-        serializer = ProductSerializer(product, many=False)
-        return Response(serializer.data)
+        try:
+            body = get_cached_json(Product, kwargs['pk'], ProductSerializer)
+        except Product.DoesNotExist:
+            return Response(status=404)
+        return HttpResponse(body, content_type='application/json')
 
 
 class ProductCreateView(APIView):
     
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     id_param_config = openapi.Parameter('id',
@@ -142,7 +285,7 @@ class ProductCreateView(APIView):
 
 class ProductUpdateView(APIView):
 
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     id_param_config = openapi.Parameter('id',
@@ -167,26 +310,123 @@ class ProductUpdateView(APIView):
         })
 
     def post(self, request, *args, **kwargs):
-        productID = kwargs['pk']
-
-        if cache.get(productID):
-            product = cache.get(productID)
-            print("Cache hit")
-        else:
-            try:
-                product = Product.objects.get(pk=productID)
-                cache.set(productID, product)
-                print("Cache miss")
-            except Product.DoesNotExist:
-                return Response(status=404)
+        try:
+            product = Product.objects.get(pk=kwargs['pk'])
+        except Product.DoesNotExist:
+            return Response(status=404)
         serializer = ProductSerializer(instance=product, data=request.data)
         if serializer.is_valid():
             serializer.save()
         return Response(serializer.data)
 
+class ProductBulkCreateView(APIView):
+
+    throttle_classes = [GCRAUserRateThrottle]
+    permission_classes = (IsAuthenticated, )
+
+    access_token_param_config = openapi.Parameter('Authorization',
+                                                  openapi.IN_HEADER,
+                                                  description="access token",
+                                                  type=openapi.TYPE_STRING)
+
+    @swagger_auto_schema(
+        manual_parameters=[access_token_param_config],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(type=openapi.TYPE_OBJECT),
+        ),
+        operation_description="""
+        This endpoint is used to create many products in one request.
+        Either every product is created or, if any row is invalid, none are
+        and the response lists the errors of each row in input order.
+        """,
+        responses={
+            200: openapi.Response('Success', ProductSerializer(many=True)),
+            400: openapi.Response('Bad Request', None),
+            500: openapi.Response('Internal Server Error', None),
+        })
+    def post(self, request):
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of products.'}, status=400)
+        serializer = ProductBulkSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=400)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class ProductBulkUpdateView(APIView):
+
+    throttle_classes = [GCRAUserRateThrottle]
+    permission_classes = (IsAuthenticated, )
+
+    access_token_param_config = openapi.Parameter('Authorization',
+                                                  openapi.IN_HEADER,
+                                                  description="access token",
+                                                  type=openapi.TYPE_STRING)
+
+    @swagger_auto_schema(
+        manual_parameters=[access_token_param_config],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                required=['productID'],
+                properties={
+                    'productID': openapi.Schema(type=openapi.TYPE_INTEGER),
+                },
+            ),
+        ),
+        operation_description="""
+        This endpoint is used to update many products in one request. Each
+        row must carry the productID of an existing product and only the
+        fields present in a row are changed. Either every product is updated
+        or, if any row is invalid, none are and the response lists the errors
+        of each row in input order.
+        """,
+        responses={
+            200: openapi.Response('Success', ProductSerializer(many=True)),
+            400: openapi.Response('Bad Request', None),
+            500: openapi.Response('Internal Server Error', None),
+        })
+    def post(self, request):
+        rows = request.data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return Response({'detail': 'Expected a list of products.'}, status=400)
+
+        productIDs = []
+        for row in rows:
+            try:
+                productIDs.append(int(row.get('productID')))
+            except (TypeError, ValueError):
+                productIDs.append(None)
+        products = Product.objects.in_bulk([pk for pk in productIDs if pk is not None])
+
+        errors = []
+        seen = set()
+        for productID in productIDs:
+            if productID is None:
+                errors.append({'productID': ['This field is required.']})
+            elif productID not in products:
+                errors.append({'productID': ['Product %s does not exist.' % productID]})
+            elif productID in seen:
+                errors.append({'productID': ['Product %s appears more than once.' % productID]})
+            else:
+                errors.append({})
+            seen.add(productID)
+        if any(errors):
+            return Response({'errors': errors}, status=400)
+
+        serializer = ProductBulkSerializer(
+            instance=[products[pk] for pk in productIDs], data=rows, many=True, partial=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=400)
+        serializer.save()
+        return Response(serializer.data)
+
 class ProductDeleteView(APIView):
 
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     id_param_config = openapi.Parameter('id',
@@ -211,24 +451,17 @@ class ProductDeleteView(APIView):
         })
         
     def delete(self, request, *args, **kwargs):
-        productID = kwargs['pk']
-        if cache.get(productID):
-            product = cache.get(productID)
-            print("Cache hit")
-        else:
-            try:
-                product = Product.objects.get(pk=productID)
-                cache.set(productID, product)
-                print("Cache miss")
-            except Product.DoesNotExist:
-                return Response(status=404)
+        try:
+            product = Product.objects.get(pk=kwargs['pk'])
+        except Product.DoesNotExist:
+            return Response(status=404)
         product.delete()
         return Response("Item deleted")
 
 
 class CategoryListView(APIView):
 
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     access_token_param_config = openapi.Parameter('Authorization',
@@ -243,30 +476,47 @@ class CategoryListView(APIView):
         """,
         responses={
             200: openapi.Response('Success', None),
+            304: openapi.Response('Not Modified', None),
             400: openapi.Response('Bad Request', None),
             404: openapi.Response('Not Found', None),
             500: openapi.Response('Internal Server Error', None),
         })
+    @method_decorator(condition(etag_func=model_etag(Category)))
     def get(self, request):
-        category = Category.objects.all()
-        serializer = CategorySerializer(category, many=True)
-        return Response(serializer.data)
+        return HttpResponse(categories.rendered(CategorySerializer), content_type='application/json')
 
 
 class OrderListView(APIView):
 
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     access_token_param_config = openapi.Parameter('Authorization',
                                                   openapi.IN_HEADER,
                                                   description="access token",
                                                   type=openapi.TYPE_STRING)
+    cursor_param_config = openapi.Parameter('cursor',
+                                            openapi.IN_QUERY,
+                                            description="pagination cursor",
+                                            type=openapi.TYPE_STRING)
+    page_size_param_config = openapi.Parameter('page_size',
+                                               openapi.IN_QUERY,
+                                               description="number of results per page",
+                                               type=openapi.TYPE_INTEGER)
+    fields_param_config = openapi.Parameter('fields',
+                                            openapi.IN_QUERY,
+                                            description="comma-separated fields to include",
+                                            type=openapi.TYPE_STRING)
+    expand_param_config = openapi.Parameter('expand',
+                                            openapi.IN_QUERY,
+                                            description="comma-separated related fields to inline: customer, order_status, items",
+                                            type=openapi.TYPE_STRING)
 
     @swagger_auto_schema(
-        manual_parameters=[access_token_param_config],
+        manual_parameters=[access_token_param_config, cursor_param_config, page_size_param_config,
+                           fields_param_config, expand_param_config],
                operation_description="""
-        This endpoint is used to retrieve a list of all placed orders.
+        This endpoint is used to retrieve a paginated list of all placed orders, newest first.
         """,
         responses={
             200: openapi.Response('Success', None),
@@ -275,14 +525,99 @@ class OrderListView(APIView):
             500: openapi.Response('Internal Server Error', None),
         })
     def get(self, request):
-        order = Order.objects.all()
-        serializer = OrderSerializer(order, many=True)
-        return Response(serializer.data)
+        fieldset, errors = parse_fieldsets(request.query_params, OrderSerializer)
+        if errors:
+            return Response(errors, status=400)
+        paginator = OrderCursorPagination()
+        keep = ordering_columns(paginator.ordering)
+        queryset = OrderSerializer.narrow_queryset(Order.objects.all(), keep=keep, **fieldset)
+        compiled = compile_serializer(OrderSerializer, **fieldset)
+        if compiled is not None:
+            queryset = compiled.values(queryset, keep=keep)
+        order = paginator.paginate_queryset(queryset, request, view=self)
+        if compiled is not None:
+            return paginator.get_paginated_response(compiled.serialize(order))
+        serializer = OrderSerializer(order, many=True, **fieldset)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class CustomerOrderListView(APIView):
+
+    throttle_classes = [GCRAUserRateThrottle]
+    permission_classes = (IsAuthenticated, )
+
+    access_token_param_config = openapi.Parameter('Authorization',
+                                                  openapi.IN_HEADER,
+                                                  description="access token",
+                                                  type=openapi.TYPE_STRING)
+    cursor_param_config = openapi.Parameter('cursor',
+                                            openapi.IN_QUERY,
+                                            description="pagination cursor",
+                                            type=openapi.TYPE_STRING)
+    page_size_param_config = openapi.Parameter('page_size',
+                                               openapi.IN_QUERY,
+                                               description="number of results per page",
+                                               type=openapi.TYPE_INTEGER)
+
+    @swagger_auto_schema(
+        manual_parameters=[access_token_param_config, cursor_param_config, page_size_param_config],
+        operation_description="""
+        This endpoint is used to retrieve the orders placed by the requesting
+        user, newest first, with their items, products and totals embedded.
+        """,
+        responses={
+            200: openapi.Response('Success', CustomerOrderSerializer(many=True)),
+            400: openapi.Response('Bad Request', None),
+            500: openapi.Response('Internal Server Error', None),
+        })
+    def get(self, request):
+        orders = Order.objects.with_totals().with_items().filter(customer_id=request.user.pk)
+        paginator = OrderCursorPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
+        serializer = CustomerOrderSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class CheckoutView(APIView):
+
+    throttle_classes = [GCRAUserRateThrottle]
+    permission_classes = (IsAuthenticated, )
+
+    access_token_param_config = openapi.Parameter('Authorization',
+                                                  openapi.IN_HEADER,
+                                                  description="access token",
+                                                  type=openapi.TYPE_STRING)
+
+    @swagger_auto_schema(
+        manual_parameters=[access_token_param_config],
+        request_body=CheckoutSerializer,
+        operation_description="""
+        This endpoint is used to place an order for the requesting user.
+        Stock for every item is reserved atomically; if any product does not
+        have enough stock nothing is reserved and the response lists the
+        products that fell short.
+        """,
+        responses={
+            201: openapi.Response('Created', CustomerOrderSerializer),
+            400: openapi.Response('Bad Request', None),
+            409: openapi.Response('Conflict', None),
+            500: openapi.Response('Internal Server Error', None),
+        })
+    def post(self, request):
+        serializer = CheckoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        try:
+            order = place_order(request.user.pk, serializer.validated_data['items'])
+        except OutOfStock as exc:
+            return Response({'detail': 'Insufficient stock.', 'products': exc.productIDs}, status=409)
+        order = Order.objects.with_totals().with_items().get(pk=order.pk)
+        return Response(CustomerOrderSerializer(order).data, status=201)
 
 
 class OrderDetailView(APIView):
 
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     id_param_config = openapi.Parameter('id',
@@ -307,23 +642,15 @@ class OrderDetailView(APIView):
         })
 
     def get(self, request, *args, **kwargs):
-        orderItemID = kwargs['pk']
-        if cache.get(orderItemID):
-            order = cache.get(orderItemID)
-            print("Cache hit")
-        else:
-            try:
-                order = OrderItem.objects.get(pk=orderItemID)
-                cache.set(orderItemID, order)
-                print("Cache miss")
-            except Order.DoesNotExist:
-                return Response(status=404)
-        serializer = OrderItemSerializer(order, many=False)
-        return Response(serializer.data)
+        try:
+            body = get_cached_json(OrderItem, kwargs['pk'], OrderItemSerializer)
+        except OrderItem.DoesNotExist:
+            return Response(status=404)
+        return HttpResponse(body, content_type='application/json')
 
 class AddressDetailView(APIView):
     
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     id_param_config = openapi.Parameter('id',
@@ -348,24 +675,16 @@ class AddressDetailView(APIView):
         })
 
     def get(self, request, *args, **kwargs):
-        addressID = kwargs['pk']
-        if cache.get(addressID):
-            address = cache.get(addressID)
-            print("Cache hit")
-        else: 
-            try:
-                address = ShippingAddress.objects.get(pk=addressID)
-                cache.set(addressID, address)
-                print("Cache miss")
-            except ShippingAddress.DoesNotExist:
-                return Response(status=404)
-        serializer = ShippingAddressSerializer(address, many=False)
-        return Response(serializer.data)
+        try:
+            body = get_cached_json(ShippingAddress, kwargs['pk'], ShippingAddressSerializer)
+        except ShippingAddress.DoesNotExist:
+            return Response(status=404)
+        return HttpResponse(body, content_type='application/json')
 
 
 class AddressCreateView(APIView):
     
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     @swagger_auto_schema(
@@ -398,7 +717,7 @@ class AddressCreateView(APIView):
 
 class AddressUpdateView(APIView):
 
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     id_param_config = openapi.Parameter('id',
@@ -423,17 +742,10 @@ class AddressUpdateView(APIView):
         })
 
     def post(self, request, *args, **kwargs):
-        addressID = kwargs['pk']
-        if cache.get(addressID):
-            address = cache.get(addressID)
-            print("Cache hit")
-        else: 
-            try:
-                address = ShippingAddress.objects.get(pk=addressID)
-                cache.set(addressID, address)
-                print("Cache miss")
-            except ShippingAddress.DoesNotExist:
-                return Response(status=404)
+        try:
+            address = ShippingAddress.objects.get(pk=kwargs['pk'])
+        except ShippingAddress.DoesNotExist:
+            return Response(status=404)
         serializer = ShippingAddressSerializer(instance=address, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -443,7 +755,7 @@ class AddressUpdateView(APIView):
        
 class AddressDeleteView(APIView):
 
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [GCRAUserRateThrottle]
     permission_classes = (IsAuthenticated, )
 
     id_param_config = openapi.Parameter('id',
@@ -468,24 +780,17 @@ class AddressDeleteView(APIView):
         })
     
     def delete(self, request, *args, **kwargs):
-        addressID = kwargs['pk']
-        if cache.get(addressID):
-            address = cache.get(addressID)
-            print("Cache hit")
-        else: 
-            try:
-                address = ShippingAddress.objects.get(pk=addressID)
-                cache.set(addressID, address)
-                print("Cache miss")
-            except ShippingAddress.DoesNotExist:
-                return Response(status=404)
+        try:
+            address = ShippingAddress.objects.get(pk=kwargs['pk'])
+        except ShippingAddress.DoesNotExist:
+            return Response(status=404)
         address.delete()
         return Response("Item deleted")
 
 
 class ReviewDetailView(APIView):
     
-        throttle_classes = [UserRateThrottle]
+        throttle_classes = [GCRAUserRateThrottle]
         permission_classes = (IsAuthenticated, )
     
         id_param_config = openapi.Parameter('id',
@@ -510,23 +815,61 @@ class ReviewDetailView(APIView):
             })
     
         def get(self, request, *args, **kwargs):
-            ReviewID = kwargs['pk']
-            if cache.get(ReviewID):
-                review = cache.get(ReviewID)
-                print("Cache hit")
-            else: 
-                try:
-                    review = ProductReview.objects.get(pk=ReviewID)
-                    cache.set(ReviewID, review)
-                    print("Cache miss")
-                except ProductReview.DoesNotExist:
-                    return Response(status=404)
-            serializer = ProductReviewSerializer(review, many=False)
-            return Response(serializer.data)
+            try:
+                body = get_cached_json(ProductReview, kwargs['pk'], ProductReviewSerializer)
+            except ProductReview.DoesNotExist:
+                return Response(status=404)
+            return HttpResponse(body, content_type='application/json')
+
+class ProductReviewListView(APIView):
+
+    throttle_classes = [GCRAUserRateThrottle]
+    permission_classes = (IsAuthenticated, )
+
+    id_param_config = openapi.Parameter('id',
+                                        openapi.IN_PATH,
+                                        description="Product ID",
+                                        type=openapi.TYPE_INTEGER)
+    access_token_param_config = openapi.Parameter('Authorization',
+                                                  openapi.IN_HEADER,
+                                                  description="access token",
+                                                  type=openapi.TYPE_STRING)
+    cursor_param_config = openapi.Parameter('cursor',
+                                            openapi.IN_QUERY,
+                                            description="pagination cursor",
+                                            type=openapi.TYPE_STRING)
+    page_size_param_config = openapi.Parameter('page_size',
+                                               openapi.IN_QUERY,
+                                               description="number of results per page",
+                                               type=openapi.TYPE_INTEGER)
+
+    @swagger_auto_schema(
+        manual_parameters=[id_param_config, access_token_param_config, cursor_param_config, page_size_param_config],
+               operation_description="""
+        This endpoint is used to retrieve a paginated list of a product's reviews,
+        newest first, together with the product's rating summary.
+        """,
+        responses={
+            200: openapi.Response('Success', None),
+            400: openapi.Response('Bad Request', None),
+            404: openapi.Response('Not Found', None),
+            500: openapi.Response('Internal Server Error', None),
+        })
+    def get(self, request, *args, **kwargs):
+        try:
+            product = get_cached_object(Product, kwargs['pk'])
+        except Product.DoesNotExist:
+            return Response(status=404)
+        paginator = ReviewCursorPagination()
+        reviews = paginator.paginate_queryset(ProductReview.objects.filter(product=product), request, view=self)
+        serializer = ProductReviewSerializer(reviews, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['rating'] = product.rating_summary
+        return response
 
 class ReviewCreateView(APIView):
     
-        throttle_classes = [UserRateThrottle]
+        throttle_classes = [GCRAUserRateThrottle]
         permission_classes = (IsAuthenticated, )
     
         @swagger_auto_schema(
@@ -555,7 +898,7 @@ class ReviewCreateView(APIView):
 
 class ReviewDeleteView(APIView):
     
-        throttle_classes = [UserRateThrottle]
+        throttle_classes = [GCRAUserRateThrottle]
         permission_classes = (IsAuthenticated, )
     
         id_param_config = openapi.Parameter('id',
@@ -579,16 +922,9 @@ class ReviewDeleteView(APIView):
                 500: openapi.Response('Internal Server Error', None),
             })
         def delete(self, request, *args, **kwargs):
-            ReviewID = kwargs['pk']
-            if cache.get(ReviewID):
-                review = cache.get(ReviewID)
-                print("Cache hit")
-            else: 
-                try:
-                    review = ProductReview.objects.get(pk=ReviewID)
-                    cache.set(ReviewID, review)
-                    print("Cache miss")
-                except ProductReview.DoesNotExist:
-                    return Response(status=404)
+            try:
+                review = ProductReview.objects.get(pk=kwargs['pk'])
+            except ProductReview.DoesNotExist:
+                return Response(status=404)
             review.delete()
             return Response("Item deleted")
\ No newline at end of file